@@ -5,8 +5,8 @@
 # Contains shared fixtures and configuration for all test files
 
 import pytest
-import os
 from pathlib import Path
+from database import DatabaseManager
 
 def pytest_configure(config):
     """
@@ -30,12 +30,20 @@ def test_data_dir():
     return test_dir
 
 @pytest.fixture(autouse=True)
-def setup_test_env():
+def setup_test_env(monkeypatch, tmp_path_factory):
     """
-    Fixture to set up test environment variables
+    Fixture to set up test environment variables, restored after each test
     """
-    os.environ["DEEPSEEK_API_KEY"] = "test_key"
-    os.environ["TEST_MODE"] = "true"
-    yield
-    # Clean up
-    os.environ.pop("TEST_MODE", None)
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test_key")
+    monkeypatch.setenv("TEST_MODE", "true")
+    # Keep tests away from the real history database
+    monkeypatch.setenv("DEEPSEEK_DB_PATH", str(tmp_path_factory.mktemp("db") / "test.db"))
+
+@pytest.fixture
+def db():
+    """
+    Fixture to provide an in-memory DatabaseManager
+    """
+    manager = DatabaseManager(":memory:")
+    yield manager
+    manager.close()
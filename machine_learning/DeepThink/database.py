@@ -1,66 +1,728 @@
 #!/usr/bin/env python3
 
+import os
+import queue
 import sqlite3
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 from pathlib import Path
 
+try:
+    import apsw
+except ImportError:
+    apsw = None
+
 # Version 1.0.0
 # This module handles all database operations for the DeepSeek Engineer GUI
 # It manages chat history, API credit balance, and thinking time tracking
 
+# Upper bound on queued write jobs committed together in one transaction
+_MAX_WRITE_BATCH = 256
+
+# Seconds the writer keeps gathering jobs after the first one before it commits
+_WRITE_LINGER = 0.05
+
+# Conversations whose history is kept in the in-process LRU cache
+_HISTORY_CACHE_SIZE = 32
+
+# Bumped whenever the on-disk schema changes; stored in PRAGMA user_version
+_SCHEMA_VERSION = 4
+
+# Latest message ids kept per conversation in recent_msgs
+_RECENT_MESSAGES = 200
+
+# Chat roles are stored as small integers; this seeds the roles lookup table
+_ROLES = {"user": 1, "assistant": 2, "system": 3}
+
+# STRICT tables need SQLite 3.37+; older libraries get the same columns untyped
+_STRICT = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
+
+# SQL statements are module constants so each call reuses the same string
+# object and hits sqlite3's per-connection statement cache
+_SQL_CREATE_ROLES = f"""
+    CREATE TABLE IF NOT EXISTS roles (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    ){_STRICT}
+"""
+
+_SQL_SEED_ROLES = "INSERT OR IGNORE INTO roles (id, name) VALUES " + ", ".join(
+    f"({role_id}, '{name}')" for name, role_id in _ROLES.items()
+)
+
+_SQL_CREATE_CHAT_HISTORY = f"""
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        role INTEGER NOT NULL REFERENCES roles(id),
+        content TEXT NOT NULL,
+        conversation_id TEXT NOT NULL,
+        is_reasoning INTEGER NOT NULL DEFAULT 0
+    ){_STRICT}
+"""
+
+_SQL_CREATE_API_USAGE = """
+    CREATE TABLE IF NOT EXISTS api_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        credits_used REAL NOT NULL,
+        request_type TEXT NOT NULL,
+        conversation_id TEXT NOT NULL
+    )
+"""
+
+_SQL_CREATE_THINKING_TIME = """
+    CREATE TABLE IF NOT EXISTS thinking_time (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        duration_seconds REAL NOT NULL,
+        conversation_id TEXT NOT NULL
+    )
+"""
+
+# Running per-conversation totals, kept up to date in the same transaction
+# as each usage insert so totals never need a SUM() over the history
+_SQL_CREATE_TOTALS = """
+    CREATE TABLE IF NOT EXISTS totals (
+        conversation_id TEXT PRIMARY KEY,
+        credits REAL NOT NULL DEFAULT 0,
+        thinking REAL NOT NULL DEFAULT 0
+    )
+"""
+
+# Latest message ids per conversation as a packed int64 array, oldest
+# first, so opening a conversation reads one row plus point lookups
+_SQL_CREATE_RECENT_MSGS = f"""
+    CREATE TABLE IF NOT EXISTS recent_msgs (
+        conversation_id TEXT PRIMARY KEY,
+        ids BLOB NOT NULL
+    ){_STRICT}
+"""
+
+# History loads range-scan (conversation_id, timestamp) instead of scanning
+# and sorting the table
+_SQL_CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_chat_conv_ts ON chat_history(conversation_id, timestamp)",
+)
+
+# Schema version 0 stored datetime.now().isoformat() text; convert the
+# naive local time to UTC unix microseconds without losing the fraction
+_SQL_ISO_TO_MICROS = """
+    CAST(strftime('%s', timestamp, 'utc') AS INTEGER) * 1000000
+    + CASE WHEN substr(timestamp, 20, 1) = '.'
+           THEN CAST(substr(timestamp || '000000', 21, 6) AS INTEGER)
+           ELSE 0 END
+"""
+
+# chat_history as of schema versions 1 and 2, kept for migrating older databases
+_SQL_CREATE_CHAT_HISTORY_V1 = """
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        conversation_id TEXT NOT NULL,
+        is_reasoning BOOLEAN DEFAULT 0
+    )
+"""
+
+def _rebuild_table(table: str, create_sql: str, columns: str, select: str) -> Tuple[str, ...]:
+    """Statements that recreate a table under a new definition, copying its rows."""
+    return (
+        f"ALTER TABLE {table} RENAME TO {table}_old",
+        create_sql,
+        f"INSERT INTO {table} ({columns}) SELECT {select} FROM {table}_old",
+        f"DROP TABLE {table}_old",
+    )
+
+# Statements that upgrade a database from the keyed schema version to the next
+_SQL_MIGRATIONS: Dict[int, Tuple[str, ...]] = {
+    0: (
+        *_rebuild_table(
+            "chat_history", _SQL_CREATE_CHAT_HISTORY_V1,
+            "id, timestamp, role, content, conversation_id, is_reasoning",
+            f"id, {_SQL_ISO_TO_MICROS}, role, content, conversation_id, is_reasoning",
+        ),
+        *_rebuild_table(
+            "api_usage", _SQL_CREATE_API_USAGE,
+            "id, timestamp, credits_used, request_type, conversation_id",
+            f"id, {_SQL_ISO_TO_MICROS}, credits_used, request_type, conversation_id",
+        ),
+        *_rebuild_table(
+            "thinking_time", _SQL_CREATE_THINKING_TIME,
+            "id, timestamp, duration_seconds, conversation_id",
+            f"id, {_SQL_ISO_TO_MICROS}, duration_seconds, conversation_id",
+        ),
+        *_SQL_CREATE_INDEXES,
+    ),
+    1: (
+        _SQL_CREATE_TOTALS,
+        """
+        INSERT INTO totals (conversation_id, credits, thinking)
+        SELECT conversation_id, SUM(credits), SUM(thinking) FROM (
+            SELECT conversation_id, credits_used AS credits, 0 AS thinking FROM api_usage
+            UNION ALL
+            SELECT conversation_id, 0, duration_seconds FROM thinking_time
+        )
+        GROUP BY conversation_id
+        """,
+        # Covering indexes for the old SUM() queries, superseded by totals
+        "DROP INDEX IF EXISTS idx_api_usage_conv",
+        "DROP INDEX IF EXISTS idx_thinking_conv",
+    ),
+    2: (
+        _SQL_CREATE_ROLES,
+        _SQL_SEED_ROLES,
+        # Keep any role names outside the seeded set rather than dropping rows
+        "INSERT OR IGNORE INTO roles (name) SELECT DISTINCT role FROM chat_history",
+        *_rebuild_table(
+            "chat_history", _SQL_CREATE_CHAT_HISTORY,
+            "id, timestamp, role, content, conversation_id, is_reasoning",
+            "id, timestamp, (SELECT id FROM roles WHERE name = role), content, conversation_id, "
+            "COALESCE(is_reasoning, 0) != 0",
+        ),
+        *_SQL_CREATE_INDEXES,
+    ),
+    # Filled lazily from chat_history on each conversation's next insert
+    3: (
+        _SQL_CREATE_RECENT_MSGS,
+    ),
+}
+
+# Fresh databases get the current schema as one script in one transaction
+_SQL_SCHEMA = ";\n".join((
+    "BEGIN IMMEDIATE",
+    _SQL_CREATE_ROLES,
+    _SQL_SEED_ROLES,
+    _SQL_CREATE_CHAT_HISTORY,
+    _SQL_CREATE_API_USAGE,
+    _SQL_CREATE_THINKING_TIME,
+    _SQL_CREATE_TOTALS,
+    _SQL_CREATE_RECENT_MSGS,
+    *_SQL_CREATE_INDEXES,
+    f"PRAGMA user_version = {_SCHEMA_VERSION}",
+    "COMMIT;",
+))
+
+_SQL_HAS_CHAT_HISTORY = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history'"
+
+_SQL_SELECT_ROLES = "SELECT id, name FROM roles"
+
+_SQL_INSERT_CHAT = """
+    INSERT INTO chat_history (timestamp, role, content, conversation_id, is_reasoning)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_API_USAGE = """
+    INSERT INTO api_usage (timestamp, credits_used, request_type, conversation_id)
+    VALUES (?, ?, ?, ?)
+"""
+
+_SQL_INSERT_THINKING_TIME = """
+    INSERT INTO thinking_time (timestamp, duration_seconds, conversation_id)
+    VALUES (?, ?, ?)
+"""
+
+_SQL_SELECT_HISTORY = """
+    SELECT role, content, is_reasoning
+    FROM chat_history
+    WHERE conversation_id = ?
+    ORDER BY timestamp ASC, id ASC
+"""
+
+_SQL_SELECT_HISTORY_TAIL = """
+    SELECT id, role, content, is_reasoning
+    FROM chat_history
+    WHERE conversation_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+_SQL_SELECT_LATEST_IDS = """
+    SELECT id FROM chat_history
+    WHERE conversation_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+_SQL_SELECT_RECENT = "SELECT ids FROM recent_msgs WHERE conversation_id = ?"
+
+_SQL_SET_RECENT = """
+    INSERT INTO recent_msgs (conversation_id, ids) VALUES (?, ?)
+    ON CONFLICT(conversation_id) DO UPDATE SET ids = excluded.ids
+"""
+
+_SQL_ADD_CREDITS = """
+    INSERT INTO totals (conversation_id, credits) VALUES (?, ?)
+    ON CONFLICT(conversation_id) DO UPDATE SET credits = credits + excluded.credits
+"""
+
+_SQL_ADD_THINKING_TIME = """
+    INSERT INTO totals (conversation_id, thinking) VALUES (?, ?)
+    ON CONFLICT(conversation_id) DO UPDATE SET thinking = thinking + excluded.thinking
+"""
+
+_SQL_TOTAL_CREDITS = "SELECT SUM(credits) FROM totals"
+_SQL_TOTAL_CREDITS_FOR_CONVERSATION = "SELECT credits FROM totals WHERE conversation_id = ?"
+
+_SQL_TOTAL_THINKING_TIME = "SELECT SUM(thinking) FROM totals"
+_SQL_TOTAL_THINKING_TIME_FOR_CONVERSATION = "SELECT thinking FROM totals WHERE conversation_id = ?"
+
+WriteJob = Callable[[sqlite3.Connection], Any]
+PendingWrite = Tuple[WriteJob, Future, Optional[Callable[[], None]]]
+
+if apsw is not None:
+    class _ApswCursor(apsw.Cursor):
+        @property
+        def lastrowid(self) -> int:
+            return self.connection.last_insert_rowid()
+    
+    class _ApswConnection(apsw.Connection):
+        """apsw connection exposing the slice of the sqlite3.Connection API the writer uses.
+        
+        apsw binds parameters and steps statements straight through the
+        SQLite C API, which trims per-row overhead from the insert path.
+        """
+        def __init__(self, filename: str):
+            super().__init__(filename)
+            self.cursor_factory = _ApswCursor
+        
+        def executescript(self, sql: str) -> None:
+            # apsw pauses a multi-statement script at any row-returning
+            # statement (e.g. PRAGMA journal_mode), so drain it
+            for _ in self.execute(sql):
+                pass
+
+def _insert_rows(conn: sqlite3.Connection, sql: str, rows: List[tuple]) -> Optional[int]:
+    """Insert parameter rows, returning the row id when there is exactly one."""
+    if len(rows) == 1:
+        return conn.execute(sql, rows[0]).lastrowid
+    conn.executemany(sql, rows)
+    return None
+
+def _pack_ids(ids: "array[int]") -> bytes:
+    """Serialize message ids as little-endian int64s."""
+    if sys.byteorder == "big":
+        ids = array("q", ids)
+        ids.byteswap()
+    return ids.tobytes()
+
+def _unpack_ids(blob: bytes) -> "array[int]":
+    """Inverse of _pack_ids."""
+    ids = array("q")
+    ids.frombytes(blob)
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+def _insert_chat_rows(conn: sqlite3.Connection, rows: List[tuple]) -> Optional[int]:
+    """Insert chat_history rows and append their ids to each conversation's recent_msgs.
+    
+    Returns:
+        Optional[int]: The row id when exactly one row was inserted
+    """
+    new_ids: Dict[str, List[int]] = {}
+    for row in rows:
+        rowid = conn.execute(_SQL_INSERT_CHAT, row).lastrowid
+        new_ids.setdefault(row[3], []).append(rowid)
+    
+    for conversation_id, inserted in new_ids.items():
+        current = conn.execute(_SQL_SELECT_RECENT, (conversation_id,)).fetchone()
+        if current is None:
+            # First insert since recent_msgs existed; seed from the full history
+            latest = conn.execute(_SQL_SELECT_LATEST_IDS, (conversation_id, _RECENT_MESSAGES)).fetchall()
+            ids = array("q", (row_id for row_id, in reversed(latest)))
+        else:
+            ids = _unpack_ids(current[0])
+            ids.extend(inserted)
+            del ids[:-_RECENT_MESSAGES]
+        conn.execute(_SQL_SET_RECENT, (conversation_id, _pack_ids(ids)))
+    
+    return rowid if len(rows) == 1 else None
+
+def _completed(result: Any = None) -> Future:
+    """Return a Future that is already resolved to 'result'."""
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "deepseek_engineer_history.db"):
-        """Initialize database connection and create tables if they don't exist.
+    def __init__(self, db_path: Optional[str] = None, max_readers: Optional[int] = None):
+        """Initialize database connections and create tables if they don't exist.
+        
+        A single writer connection handles every insert while a pool of
+        read-only connections serves queries, so WAL readers never wait
+        behind the writer. Inserts are queued to a background thread that
+        commits whatever has accumulated in one transaction, so callers on
+        the UI thread never block on SQLite.
         
         Args:
-            db_path (str): Path to the SQLite database file
+            db_path (Optional[str]): Path to the SQLite database file, defaults
+                to $DEEPSEEK_DB_PATH or deepseek_engineer_history.db
+            max_readers (Optional[int]): Size of the read-only connection pool,
+                defaults to the number of CPUs
         """
+        if db_path is None:
+            db_path = os.environ.get("DEEPSEEK_DB_PATH", "deepseek_engineer_history.db")
         self.db_path = db_path
+        self._write_lock = threading.Lock()
+        self._conn = self._connect()
         self._init_database()
+        self._role_names: Dict[int, str] = dict(self._conn.execute(_SQL_SELECT_ROLES).fetchall())
+        self._role_ids = {name: role_id for role_id, name in self._role_names.items()}
         
-    def _init_database(self) -> None:
-        """Create necessary tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Create chat_history table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    conversation_id TEXT NOT NULL,
-                    is_reasoning BOOLEAN DEFAULT 0
-                )
-            """)
-            
-            # Create api_usage table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS api_usage (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    credits_used REAL NOT NULL,
-                    request_type TEXT NOT NULL,
-                    conversation_id TEXT NOT NULL
-                )
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        if db_path in ("", ":memory:"):
+            # A private in-memory database only exists on its own connection
+            self._readers.put(self._conn)
+        else:
+            for _ in range(max_readers or os.cpu_count() or 1):
+                self._readers.put(self._connect(read_only=True))
+        
+        # Query results cached in-process; _cache_epoch advances on every
+        # commit so a read racing a write never caches what it saw
+        self._cache_lock = threading.Lock()
+        self._cache_epoch = 0
+        self._totals_cache: Dict[Tuple[str, Optional[str]], float] = {}
+        self._history_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # Guards only the data_version probe. SQLite serializes each statement
+        # on the shared writer connection, so a probe waits for at most one
+        # statement rather than the writer's whole transaction under _write_lock
+        self._probe_lock = threading.Lock()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        
+        # Writes collected between begin_batch() and commit_batch()
+        self._batch_lock = threading.Lock()
+        self._batch: Optional[List[PendingWrite]] = None
+        self._batch_depth = 0
+        
+        self._closed = False
+        self._wq: "queue.Queue[Optional[List[PendingWrite]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="DatabaseWriter", daemon=True)
+        self._writer.start()
+        
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Open a connection tuned for concurrent GUI access.
+        
+        WAL lets readers proceed while a write is in progress, and
+        synchronous=NORMAL only fsyncs at WAL checkpoints instead of on
+        every commit. mmap_size maps up to 256 MiB of the file so page reads
+        come straight from the OS page cache; like WAL, this expects the
+        database on a local filesystem rather than a network share.
+        
+        Args:
+            read_only (bool): Open the database with mode=ro for the reader pool
+        
+        The writer uses apsw when it is installed and falls back to the
+        stdlib sqlite3 module otherwise; readers always use sqlite3.
+        
+        Returns:
+            sqlite3.Connection: Configured database connection
+        """
+        if read_only:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True,
+                                   isolation_level=None, check_same_thread=False)
+            conn.executescript("""
+                PRAGMA busy_timeout=5000;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-20000;
+                PRAGMA mmap_size=268435456;
             """)
+            return conn
+        
+        if apsw is not None:
+            conn = _ApswConnection(self.db_path)
+        else:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA busy_timeout=5000;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-20000;
+            PRAGMA foreign_keys=ON;
+            PRAGMA cache_spill=OFF;
+            PRAGMA mmap_size=268435456;
+        """)
+        return conn
+    
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block of writes in one BEGIN IMMEDIATE transaction.
+        
+        Taking the write lock up front avoids the deferred-to-write upgrade
+        that can fail with SQLITE_BUSY when another process is writing. A
+        failed COMMIT is rolled back too, so the connection never stays
+        inside a transaction and the next BEGIN IMMEDIATE can start cleanly.
+        """
+        with self._write_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+    
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the read-only pool.
+        
+        Pending queued writes are flushed first so callers always read
+        their own writes.
+        """
+        self.flush()
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+        
+    def _init_database(self) -> None:
+        """Create necessary tables if they don't exist, or migrate older schemas.
+        
+        The schema version lives in PRAGMA user_version, so an up-to-date
+        database costs a single pragma read at startup.
+        """
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+            return
+        
+        if not self._conn.execute(_SQL_HAS_CHAT_HISTORY).fetchone():
+            # Every CREATE is IF NOT EXISTS, so racing another process here is harmless
+            with self._write_lock:
+                try:
+                    self._conn.executescript(_SQL_SCHEMA)
+                except BaseException:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    raise
+            return
+        
+        with self._write_transaction() as conn:
+            # Re-check under the write lock in case another process migrated first
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for v in range(version, _SCHEMA_VERSION):
+                for sql in _SQL_MIGRATIONS[v]:
+                    conn.execute(sql)
+            if version < _SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    
+    def _submit(self, job: WriteJob, on_commit: Optional[Callable[[], None]] = None) -> Future:
+        """Queue a write job for the background writer thread.
+        
+        Args:
+            job (WriteJob): Callable run with the writer connection inside
+                the batch transaction
+            on_commit (Optional[Callable[[], None]]): Called under the cache
+                lock once the job's transaction has committed
             
-            # Create thinking_time table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS thinking_time (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    duration_seconds REAL NOT NULL,
-                    conversation_id TEXT NOT NULL
-                )
-            """)
+        Returns:
+            Future: Resolves to the job's return value once committed
+        """
+        if self._closed:
+            raise RuntimeError("DatabaseManager is closed")
+        future: Future = Future()
+        with self._batch_lock:
+            if self._batch is not None:
+                self._batch.append((job, future, on_commit))
+                return future
+        self._wq.put([(job, future, on_commit)])
+        return future
+    
+    def begin_batch(self) -> None:
+        """Hold back writes until the matching commit_batch() call.
+        
+        Batches nest; writes from every thread are collected and queued
+        together when the outermost batch commits, so they land in a single
+        transaction. Held writes are not visible to reads until then.
+        """
+        with self._batch_lock:
+            self._batch_depth += 1
+            if self._batch is None:
+                self._batch = []
+    
+    def commit_batch(self) -> None:
+        """Queue the writes held since begin_batch() once the outermost batch ends."""
+        with self._batch_lock:
+            if self._batch_depth == 0:
+                return
+            self._batch_depth -= 1
+            if self._batch_depth:
+                return
+            batch, self._batch = self._batch, None
+        if batch:
+            self._wq.put(batch)
+    
+    def _writer_loop(self) -> None:
+        """Drain the write queue, committing each drained batch at once.
+        
+        After the first job arrives the writer lingers for up to _WRITE_LINGER
+        seconds so a burst of separate writes shares one commit. An empty list
+        on the queue comes from flush() and ends the wait early.
+        """
+        while True:
+            batch = self._wq.get()
+            taken = 1
+            stop = batch is None
+            batch = batch or []
+            deadline = time.monotonic() + _WRITE_LINGER
+            while batch and not stop and len(batch) < _MAX_WRITE_BATCH:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        more = self._wq.get(timeout=remaining)
+                    else:
+                        more = self._wq.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if more is None:
+                    stop = True
+                elif not more:
+                    break
+                else:
+                    batch.extend(more)
             
-            conn.commit()
+            if batch:
+                self._run_write_batch(batch)
+            for _ in range(taken):
+                self._wq.task_done()
+            if stop:
+                return
+    
+    def _run_write_batch(self, batch: List[PendingWrite]) -> None:
+        """Run queued jobs in one transaction, isolating each in a savepoint.
+        
+        A failing job is rolled back to its savepoint and reported through
+        its own future without discarding the rest of the batch.
+        """
+        outcomes = []
+        try:
+            with self._write_transaction() as conn:
+                for job, future, on_commit in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT write_job")
+                    try:
+                        outcomes.append((future, job(conn), None, on_commit))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write_job")
+                        outcomes.append((future, None, e, None))
+                    conn.execute("RELEASE write_job")
+        except Exception as e:
+            logging.error(f"Error committing database writes: {str(e)}")
+            for job, future, on_commit in batch:
+                if future.running():
+                    future.set_exception(e)
+            return
+        
+        with self._cache_lock:
+            self._cache_epoch += 1
+            for future, result, error, on_commit in outcomes:
+                if on_commit is not None:
+                    on_commit()
+        
+        for future, result, error, on_commit in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                logging.error(f"Error writing to database: {str(error)}")
+                future.set_exception(error)
+    
+    def _invalidate_totals(self, column: str, conversation_ids: Iterable[str]) -> None:
+        """Drop cached totals for 'column'; called with the cache lock held."""
+        self._totals_cache.pop((column, None), None)
+        for conversation_id in conversation_ids:
+            self._totals_cache.pop((column, conversation_id), None)
     
-    def add_chat_message(self, role: str, content: str, conversation_id: str, is_reasoning: bool = False) -> None:
+    def _role_id(self, role: str) -> int:
+        """Map a role name to its roles table id."""
+        try:
+            return self._role_ids[role]
+        except KeyError:
+            raise ValueError(f"Unknown chat role: {role}") from None
+    
+    def _invalidate_history(self, conversation_ids: Iterable[str]) -> None:
+        """Drop cached chat history; called with the cache lock held."""
+        for conversation_id in conversation_ids:
+            self._history_cache.pop(conversation_id, None)
+    
+    def _check_external_writes(self) -> None:
+        """Clear every cache if another connection committed since the last check.
+        
+        PRAGMA data_version on the writer connection only changes when some
+        other connection (e.g. a second process) commits, so our own writes
+        keep their targeted invalidation. The probe takes _probe_lock rather
+        than _write_lock, so cached reads never wait out a write batch.
+        """
+        with self._probe_lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._cache_lock:
+            if version != self._data_version:
+                self._data_version = version
+                self._cache_epoch += 1
+                self._totals_cache.clear()
+                self._history_cache.clear()
+    
+    def _get_total(self, column: str, conversation_id: Optional[str], sql: str, params: tuple) -> float:
+        """Read a running total, serving repeat polls from the in-process cache."""
+        self.flush()
+        self._check_external_writes()
+        key = (column, conversation_id)
+        with self._cache_lock:
+            epoch = self._cache_epoch
+            cached = self._totals_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        with self._reader() as conn:
+            row = conn.execute(sql, params).fetchone()
+        total = float(row[0]) if row and row[0] else 0.0
+        
+        with self._cache_lock:
+            if self._cache_epoch == epoch:
+                self._totals_cache[key] = total
+        return total
+    
+    def flush(self) -> None:
+        """Block until every queued write has been committed."""
+        if not self._closed:
+            if self._wq.unfinished_tasks:
+                # Cut the writer's linger short rather than wait it out
+                self._wq.put([])
+            self._wq.join()
+    
+    def close(self) -> None:
+        """Flush pending writes, then close the writer and every pooled reader connection."""
+        if self._closed:
+            return
+        with self._batch_lock:
+            self._batch_depth = 0
+            batch, self._batch = self._batch, None
+        if batch:
+            self._wq.put(batch)
+        self._closed = True
+        self._wq.put(None)
+        self._writer.join()
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not self._conn:
+                conn.close()
+        self._conn.close()
+    
+    def add_chat_message(self, role: str, content: str, conversation_id: str, is_reasoning: bool = False) -> Future:
         """Add a new chat message to the history.
         
         Args:
@@ -68,17 +730,31 @@ class DatabaseManager:
             content (str): Message content
             conversation_id (str): Unique conversation identifier
             is_reasoning (bool): Whether this is a reasoning message
+            
+        Returns:
+            Future: Resolves to the new row id once committed
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO chat_history (timestamp, role, content, conversation_id, is_reasoning)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (datetime.now().isoformat(), role, content, conversation_id, is_reasoning)
-            )
-            conn.commit()
+        return self.add_chat_messages([(role, content, conversation_id, is_reasoning)])
+    
+    def add_chat_messages(self, rows: List[Tuple[str, str, str, bool]]) -> Future:
+        """Add several chat messages in a single transaction.
+        
+        Args:
+            rows (List[Tuple[str, str, str, bool]]): (role, content, conversation_id,
+                is_reasoning) tuples in display order
+            
+        Returns:
+            Future: Completes once the rows are committed
+        """
+        if not rows:
+            return _completed()
+        # One clock read stamps the whole batch
+        timestamp = time.time_ns() // 1000
+        params = [(timestamp, self._role_id(role), content, conversation_id, is_reasoning)
+                  for role, content, conversation_id, is_reasoning in rows]
+        conversation_ids = {conversation_id for _, _, conversation_id, _ in rows}
+        return self._submit(lambda conn: _insert_chat_rows(conn, params),
+                            lambda: self._invalidate_history(conversation_ids))
     
     def get_chat_history(self, conversation_id: str) -> List[Dict[str, str]]:
         """Retrieve chat history for a specific conversation.
@@ -87,40 +763,123 @@ class DatabaseManager:
             conversation_id (str): Unique conversation identifier
             
         Returns:
-            List[Dict[str, str]]: List of chat messages
-        """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT role, content, is_reasoning
-                FROM chat_history
-                WHERE conversation_id = ?
-                ORDER BY timestamp ASC
-                """,
-                (conversation_id,)
-            )
-            return [{"role": role, "content": content, "is_reasoning": bool(is_reasoning)} 
-                   for role, content, is_reasoning in cursor.fetchall()]
-    
-    def add_api_usage(self, credits_used: float, request_type: str, conversation_id: str) -> None:
+            List[Dict[str, str]]: List of chat messages. Repeat reads are
+                served from an in-process cache, so treat the message dicts
+                as read-only.
+        """
+        self.flush()
+        self._check_external_writes()
+        with self._cache_lock:
+            epoch = self._cache_epoch
+            cached = self._history_cache.get(conversation_id)
+            if cached is not None:
+                self._history_cache.move_to_end(conversation_id)
+                return list(cached)
+        
+        history = list(self.iter_chat_history(conversation_id))
+        
+        with self._cache_lock:
+            if self._cache_epoch == epoch:
+                self._history_cache[conversation_id] = history
+                if len(self._history_cache) > _HISTORY_CACHE_SIZE:
+                    self._history_cache.popitem(last=False)
+        return list(history)
+    
+    def iter_chat_history(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream chat history for a conversation straight from the cursor.
+        
+        Rows are converted one at a time, so long conversations never sit in
+        memory twice. The generator holds a pooled reader connection until it
+        is exhausted or closed; finish iterating before issuing other reads.
+        
+        Args:
+            conversation_id (str): Unique conversation identifier
+            
+        Yields:
+            Dict[str, Any]: One chat message at a time, oldest first
+        """
+        with self._reader() as conn:
+            for role, content, is_reasoning in conn.execute(_SQL_SELECT_HISTORY, (conversation_id,)):
+                yield {"role": self._role_names[role], "content": content, "is_reasoning": bool(is_reasoning)}
+    
+    def get_chat_history_tail(self, conversation_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Retrieve the latest messages of a conversation, oldest first.
+        
+        Up to _RECENT_MESSAGES ids are kept in recent_msgs, so the common
+        case is one row read plus primary key lookups rather than a sort
+        over the conversation.
+        
+        Args:
+            conversation_id (str): Unique conversation identifier
+            limit (int): Maximum number of messages to return
+            
+        Returns:
+            List[Dict[str, Any]]: The last 'limit' chat messages
+        """
+        if limit <= 0:
+            return []
+        self.flush()
+        self._check_external_writes()
+        with self._cache_lock:
+            cached = self._history_cache.get(conversation_id)
+            if cached is not None:
+                return cached[-limit:]
+        
+        with self._reader() as conn:
+            current = conn.execute(_SQL_SELECT_RECENT, (conversation_id,)).fetchone()
+            if current is None or limit > _RECENT_MESSAGES:
+                rows = conn.execute(_SQL_SELECT_HISTORY_TAIL, (conversation_id, limit)).fetchall()
+                rows.reverse()
+            else:
+                ids = _unpack_ids(current[0])[-limit:]
+                placeholders = ", ".join("?" * len(ids))
+                by_id = {row[0]: row for row in conn.execute(
+                    f"SELECT id, role, content, is_reasoning FROM chat_history WHERE id IN ({placeholders})",
+                    tuple(ids)
+                )}
+                rows = [by_id[row_id] for row_id in ids if row_id in by_id]
+        
+        return [{"role": self._role_names[role], "content": content, "is_reasoning": bool(is_reasoning)}
+                for _, role, content, is_reasoning in rows]
+    
+    def add_api_usage(self, credits_used: float, request_type: str, conversation_id: str) -> Future:
         """Record API credit usage.
         
         Args:
             credits_used (float): Number of API credits used
             request_type (str): Type of API request
             conversation_id (str): Unique conversation identifier
+            
+        Returns:
+            Future: Resolves to the new row id once committed
+        """
+        return self.add_api_usages([(credits_used, request_type, conversation_id)])
+    
+    def add_api_usages(self, rows: List[Tuple[float, str, str]]) -> Future:
+        """Record several API usage entries in a single transaction.
+        
+        Args:
+            rows (List[Tuple[float, str, str]]): (credits_used, request_type,
+                conversation_id) tuples
+            
+        Returns:
+            Future: Completes once the rows are committed
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO api_usage (timestamp, credits_used, request_type, conversation_id)
-                VALUES (?, ?, ?, ?)
-                """,
-                (datetime.now().isoformat(), credits_used, request_type, conversation_id)
-            )
-            conn.commit()
+        if not rows:
+            return _completed()
+        # One clock read stamps the whole batch
+        timestamp = time.time_ns() // 1000
+        params = [(timestamp, credits_used, request_type, conversation_id)
+                  for credits_used, request_type, conversation_id in rows]
+        
+        def job(conn: sqlite3.Connection) -> Optional[int]:
+            rowid = _insert_rows(conn, _SQL_INSERT_API_USAGE, params)
+            conn.executemany(_SQL_ADD_CREDITS, [(conversation_id, credits_used)
+                                                for credits_used, _, conversation_id in rows])
+            return rowid
+        
+        conversation_ids = {conversation_id for _, _, conversation_id in rows}
+        return self._submit(job, lambda: self._invalidate_totals("credits", conversation_ids))
     
     def get_total_credits_used(self, conversation_id: Optional[str] = None) -> float:
         """Get total API credits used.
@@ -131,40 +890,46 @@ class DatabaseManager:
         Returns:
             float: Total credits used
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            if conversation_id:
-                cursor.execute(
-                    """
-                    SELECT SUM(credits_used)
-                    FROM api_usage
-                    WHERE conversation_id = ?
-                    """,
-                    (conversation_id,)
-                )
-            else:
-                cursor.execute("SELECT SUM(credits_used) FROM api_usage")
-            
-            result = cursor.fetchone()[0]
-            return float(result) if result else 0.0
+        if conversation_id:
+            return self._get_total("credits", conversation_id, _SQL_TOTAL_CREDITS_FOR_CONVERSATION, (conversation_id,))
+        return self._get_total("credits", None, _SQL_TOTAL_CREDITS, ())
     
-    def add_thinking_time(self, duration_seconds: float, conversation_id: str) -> None:
+    def add_thinking_time(self, duration_seconds: float, conversation_id: str) -> Future:
         """Record thinking time duration.
         
         Args:
             duration_seconds (float): Duration in seconds
             conversation_id (str): Unique conversation identifier
+            
+        Returns:
+            Future: Resolves to the new row id once committed
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO thinking_time (timestamp, duration_seconds, conversation_id)
-                VALUES (?, ?, ?)
-                """,
-                (datetime.now().isoformat(), duration_seconds, conversation_id)
-            )
-            conn.commit()
+        return self.add_thinking_times([(duration_seconds, conversation_id)])
+    
+    def add_thinking_times(self, rows: List[Tuple[float, str]]) -> Future:
+        """Record several thinking time durations in a single transaction.
+        
+        Args:
+            rows (List[Tuple[float, str]]): (duration_seconds, conversation_id) tuples
+            
+        Returns:
+            Future: Completes once the rows are committed
+        """
+        if not rows:
+            return _completed()
+        # One clock read stamps the whole batch
+        timestamp = time.time_ns() // 1000
+        params = [(timestamp, duration_seconds, conversation_id)
+                  for duration_seconds, conversation_id in rows]
+        
+        def job(conn: sqlite3.Connection) -> Optional[int]:
+            rowid = _insert_rows(conn, _SQL_INSERT_THINKING_TIME, params)
+            conn.executemany(_SQL_ADD_THINKING_TIME, [(conversation_id, duration_seconds)
+                                                      for duration_seconds, conversation_id in rows])
+            return rowid
+        
+        conversation_ids = {conversation_id for _, conversation_id in rows}
+        return self._submit(job, lambda: self._invalidate_totals("thinking", conversation_ids))
     
     def get_total_thinking_time(self, conversation_id: Optional[str] = None) -> float:
         """Get total thinking time.
@@ -175,19 +940,42 @@ class DatabaseManager:
         Returns:
             float: Total thinking time in seconds
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            if conversation_id:
-                cursor.execute(
-                    """
-                    SELECT SUM(duration_seconds)
-                    FROM thinking_time
-                    WHERE conversation_id = ?
-                    """,
-                    (conversation_id,)
-                )
-            else:
-                cursor.execute("SELECT SUM(duration_seconds) FROM thinking_time")
+        if conversation_id:
+            return self._get_total("thinking", conversation_id, _SQL_TOTAL_THINKING_TIME_FOR_CONVERSATION, (conversation_id,))
+        return self._get_total("thinking", None, _SQL_TOTAL_THINKING_TIME, ())
+    
+    def record_turn(self, role: str, content: Optional[str], conversation_id: str,
+                    credits_used: float, thinking_seconds: float, is_reasoning: bool = False,
+                    request_type: str = "chat_completion") -> Future:
+        """Record everything one assistant turn produces in a single transaction.
+        
+        Args:
+            role (str): Message role ('user' or 'assistant')
+            content (Optional[str]): Message content, or None to record only
+                the usage and thinking time
+            conversation_id (str): Unique conversation identifier
+            credits_used (float): Number of API credits used
+            thinking_seconds (float): Time the model spent reasoning
+            is_reasoning (bool): Whether this is a reasoning message
+            request_type (str): Type of API request
             
-            result = cursor.fetchone()[0]
-            return float(result) if result else 0.0
+        Returns:
+            Future: Completes once the turn is committed
+        """
+        timestamp = time.time_ns() // 1000
+        role_id = self._role_id(role)
+        
+        def job(conn: sqlite3.Connection) -> None:
+            if content is not None:
+                _insert_chat_rows(conn, [(timestamp, role_id, content, conversation_id, is_reasoning)])
+            conn.execute(_SQL_INSERT_API_USAGE, (timestamp, credits_used, request_type, conversation_id))
+            conn.execute(_SQL_ADD_CREDITS, (conversation_id, credits_used))
+            conn.execute(_SQL_INSERT_THINKING_TIME, (timestamp, thinking_seconds, conversation_id))
+            conn.execute(_SQL_ADD_THINKING_TIME, (conversation_id, thinking_seconds))
+        
+        def on_commit() -> None:
+            self._invalidate_history((conversation_id,))
+            self._invalidate_totals("credits", (conversation_id,))
+            self._invalidate_totals("thinking", (conversation_id,))
+        
+        return self._submit(job, on_commit)
@@ -1,38 +1,117 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import json
+import asyncio
+import tempfile
 import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import uuid
+import weakref
 from pathlib import Path
 from textwrap import dedent
-from typing import List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import customtkinter as ctk
-from openai import OpenAI
-from pydantic import BaseModel
 from dotenv import load_dotenv
-from rich.console import Console
+from urllib3.util.retry import Retry
 from tkinter import filedialog
 import logging
 from database import DatabaseManager  
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
-console = Console()
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
-class FileToCreate(BaseModel):
+# orjson parses replies several times faster when installed; its decode
+# error subclasses json.JSONDecodeError, so both are handled the same way
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Dedented once at import; every conversation shares this string
+_SYSTEM_PROMPT = dedent("""\
+You are an elite software engineer called DeepSeek Engineer with decades of experience across all programming domains.
+Your expertise spans system design, algorithms, testing, and best practices.
+You provide thoughtful, well-structured solutions while explaining your reasoning.
+
+Core capabilities:
+1. Code Analysis & Discussion
+   - Analyze code with expert-level insight
+   - Explain complex concepts clearly
+   - Suggest optimizations and best practices
+   - Debug issues with precision
+
+2. File Operations:
+   When files are added to the workspace:
+   - You can automatically read their contents
+   - You can analyze multiple files together
+   - You can make changes or create new files
+   - You will be notified when files are added
+
+When working with files:
+1. First analyze the code and explain what you understand
+2. Propose specific changes or improvements
+3. Use the file operation JSON format to make changes
+4. Confirm what was changed and explain the improvements
+
+Output Format for File Operations:
+{
+  "assistant_reply": "Your explanation of the changes",
+  "files_to_create": [
+    {
+      "path": "relative/path/to/new/file",
+      "content": "complete file content with proper formatting"
+    }
+  ],
+  "files_to_edit": [
+    {
+      "path": "path/to/file",
+      "original_snippet": "exact code to replace (include enough context)",
+      "new_snippet": "new code with proper indentation"
+    }
+  ]
+}
+
+Guidelines:
+1. When a file is added:
+   - Automatically read and analyze it
+   - Suggest improvements if needed
+   - Make changes using the JSON format
+2. For new files:
+   - Include complete, properly formatted code
+   - Add necessary imports and dependencies
+3. For editing files:
+   - Use precise, minimal edits
+   - Maintain code style and formatting
+4. After changes:
+   - Confirm what was changed
+   - Explain how to test the changes
+
+Remember: You're a senior engineer - be thorough, precise, and thoughtful in your solutions.
+""")
+
+# Shapes of the JSON reply format; slotted so instances carry no __dict__
+@dataclass(slots=True)
+class FileToCreate:
     path: str
     content: str
 
-class FileToEdit(BaseModel):
+@dataclass(slots=True)
+class FileToEdit:
     path: str
     original_snippet: str
     new_snippet: str
 
-class AssistantResponse(BaseModel):
+@dataclass(slots=True)
+class AssistantResponse:
     assistant_reply: str
     files_to_create: Optional[List[FileToCreate]] = None
     files_to_edit: Optional[List[FileToEdit]] = None
@@ -42,27 +121,169 @@ def read_local_file(file_path: str) -> str:
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
 
+# Process umask, read once so new files get the usual default permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 def create_file(path: str, content: str):
-    """Create (or overwrite) a file at 'path' with the given 'content'."""
+    """Create (or overwrite) a file at 'path' with the given 'content'.
+    
+    The content is written to a temporary file in the same directory and
+    swapped in with os.replace, so readers never see a partial write.
+    """
     file_path = Path(path)
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(content)
+    try:
+        mode = os.stat(file_path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    except FileNotFoundError:
+        # Only the first file in a new directory pays for creating it
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
     return f"✓ Created/updated file at '{file_path}'"
 
 def apply_diff_edit(path: str, original_snippet: str, new_snippet: str) -> str:
     """Apply diff edit and return status message."""
     try:
         content = read_local_file(path)
-        if original_snippet in content:
-            updated_content = content.replace(original_snippet, new_snippet, 1)
-            create_file(path, updated_content)
-            return f"✓ Applied diff edit to '{path}'"
-        else:
+        idx = content.find(original_snippet)
+        if idx < 0:
             return f"⚠ Original snippet not found in '{path}'. No changes made."
+        create_file(path, f"{content[:idx]}{new_snippet}{content[idx + len(original_snippet):]}")
+        return f"✓ Applied diff edit to '{path}'"
     except FileNotFoundError:
         return f"✗ File not found for diff editing: '{path}'"
 
+def preview_text(text: str) -> str:
+    """Return the first line of 'text', cut to 100 characters, with "..." if anything was dropped."""
+    nl = text.find('\n')
+    first = text if nl < 0 else text[:nl]
+    if len(first) > 100:
+        return first[:100] + "..."
+    return first + "..." if nl >= 0 else first
+
+# Characters that can change JSON nesting, string state or member boundaries
+_JSON_STRUCTURAL = re.compile(r'[{}\[\]"\\:,]')
+
+class JsonStreamScanner:
+    """Detect where a streamed JSON value ends without re-parsing the buffer.
+    
+    Each chunk is scanned once for brackets, quotes and escapes, so finding
+    the end of an n-character reply costs O(n) instead of a json.loads()
+    attempt per token.
+    
+    Members of the outermost object are decoded as soon as they close and
+    queued on 'values' as (key, value) pairs: strings and objects whole,
+    arrays one element at a time. Numbers, booleans and null are skipped.
+    Pass capture_members=False when only the end of the value matters.
+    """
+    def __init__(self, capture_members: bool = True):
+        self.depth = 0
+        self.in_string = False
+        self.values: List[Tuple[str, Any]] = []
+        self._capture_members = capture_members
+        self._escape_pending = False
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._in_array = False
+        # Pieces of the key or value being captured; _capture_from is where
+        # it continues in the current chunk
+        self._capture: Optional[List[str]] = None
+        self._capture_from = 0
+        self._capture_depth = 0
+        self._capture_string = False
+        self._capture_is_key = False
+    
+    def feed(self, text: str) -> bool:
+        """Scan the next chunk, returning True once the outermost value has closed."""
+        start = 0
+        if self._escape_pending and text:
+            # A backslash ended the previous chunk; its escaped char starts this one
+            self._escape_pending = False
+            start = 1
+        skip = -1
+        for match in _JSON_STRUCTURAL.finditer(text, start):
+            i = match.start()
+            if i == skip:
+                continue
+            ch = match.group()
+            if self.in_string:
+                if ch == "\\":
+                    skip = i + 1
+                    self._escape_pending = skip == len(text)
+                elif ch == '"':
+                    self.in_string = False
+                    if self._capture_string:
+                        self._end_capture(text, i)
+            elif ch == '"':
+                self.in_string = True
+                if self.depth == 1 and self._expect_key and self._capture_members:
+                    # Without a key no member value is ever captured either
+                    self._begin_capture(i, string=True, is_key=True)
+                elif self._at_member_value():
+                    self._begin_capture(i, string=True)
+            elif ch in "{[":
+                if self._at_member_value():
+                    if ch == "[" and self.depth == 1:
+                        self._in_array = True
+                    else:
+                        self._begin_capture(i)
+                self.depth += 1
+                if self.depth == 1:
+                    self._expect_key = ch == "{"
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+                if self.depth == 1:
+                    self._in_array = False
+                if self._capture is not None and not self._capture_string and self.depth == self._capture_depth:
+                    self._end_capture(text, i)
+            elif self.depth == 1:
+                # ':' ends a key, ',' starts the next member
+                self._expect_key = ch == ","
+        if self._capture is not None:
+            self._capture.append(text[self._capture_from:])
+            self._capture_from = 0
+        return False
+    
+    def _at_member_value(self) -> bool:
+        """Whether the next value is a top-level member or an element of one."""
+        if self._capture is not None or self._key is None:
+            return False
+        return (self.depth == 1 and not self._expect_key) or (self.depth == 2 and self._in_array)
+    
+    def _begin_capture(self, i: int, string: bool = False, is_key: bool = False) -> None:
+        self._capture = []
+        self._capture_from = i
+        self._capture_depth = self.depth
+        self._capture_string = string
+        self._capture_is_key = is_key
+    
+    def _end_capture(self, text: str, i: int) -> None:
+        self._capture.append(text[self._capture_from:i + 1])
+        raw = "".join(self._capture)
+        self._capture = None
+        try:
+            value = _json_loads(raw)
+        except ValueError as e:
+            logging.error(f"Error decoding streamed JSON value: {str(e)}")
+            return
+        if self._capture_is_key:
+            self._key = value
+        else:
+            self.values.append((self._key, value))
+
 class MessageBubble(ctk.CTkFrame):
     def __init__(self, *args, text="", is_user=True, is_reasoning=False, **kwargs):
         """Initialize a message bubble widget
@@ -75,14 +296,15 @@ class MessageBubble(ctk.CTkFrame):
         """
         super().__init__(*args, **kwargs)
         
+        # The text is kept as appended spans and only joined when read
         self.text = text
         self.is_user = is_user
         self.is_reasoning = is_reasoning
         self.expanded = False
-        self.copy_btn = None
         self.start_time = time.time()
         self.thinking_dots = 0
         self.is_thinking = True
+        self._timer_tenths = 0
         
         # Store reference to root window
         self.root = self.winfo_toplevel()
@@ -128,46 +350,36 @@ class MessageBubble(ctk.CTkFrame):
             )
             self.timer_label.pack(side="right", padx=5, pady=5)
             
-            # Create preview label (initially visible)
-            preview = text.split('\n')[0] if text else ""
-            if len(preview) > 100:
-                preview = preview[:100] + "..."
-            elif text and len(text.split('\n')) > 1:
-                preview += "..."
-                
+            # Create preview label (initially visible). Until a newline or the
+            # 100-character cap is reached the preview is the whole text so far;
+            # after that it never changes
+            self._preview = preview_text(text)
+            self._preview_final = self._preview != text
             self.preview_label = ctk.CTkLabel(
                 self,
-                text=preview,
+                text=self._preview,
                 anchor="w",
                 justify="left",
                 wraplength=800
             )
             self.preview_label.pack(expand=True, fill="both", padx=10)
             
-            # Create full content label (initially hidden)
-            self.content_label = ctk.CTkLabel(
-                self,
-                text=text,
-                anchor="w",
-                justify="left",
-                wraplength=800
-            )
+            # The full content textbox is only created on first expand, so
+            # collapsed bubbles never pay for laying it out; _shown_chars is
+            # how much of the text it holds
+            self._shown_chars = 0
             
             # Start timer and dots animation
             self.animate_thinking()
         else:
-            # For non-reasoning messages, just show the content
-            message_label = ctk.CTkLabel(
-                self,
-                text=text,
-                anchor="w",
-                justify="left",
-                wraplength=800
-            )
-            message_label.pack(expand=True, fill="both", padx=10, pady=10)
-            
-            # Add copy button to non-reasoning messages
-            self.add_copy_button()
+            # For non-reasoning messages, show the content straight away
+            self._create_textbox()
+            self._insert_text(text)
+            self.textbox.pack(expand=True, fill="both", padx=10, pady=10)
+        
+        # The window's shared hover toolbar provides the copy button
+        self.bind("<Enter>", self._on_enter, add="+")
+        self.bind("<Leave>", self._on_leave, add="+")
 
     def stop_thinking(self):
         """Stop the thinking animation and update total thinking time"""
@@ -188,35 +400,137 @@ class MessageBubble(ctk.CTkFrame):
             )
 
     def animate_thinking(self):
-        """Animate the thinking label with dots and update timer"""
-        if not self.is_reasoning or not self.is_thinking:
+        """Start the timer and dots animation on the window's shared tick"""
+        if not self._update_thinking_display():
             return
-            
-        elapsed = time.time() - self.start_time
-        self.timer_label.configure(text=f"{elapsed:.1f}s")
+        register = getattr(self.root, "register_thinker", None)
+        if callable(register):
+            register(self)
+
+    def _update_thinking_display(self) -> bool:
+        """Advance the timer and dots by one frame.
+        
+        Returns:
+            bool: Whether the bubble is still thinking and needs further ticks
+        """
+        if not self.is_reasoning or not self.is_thinking:
+            return False
+        
+        # Nothing to redraw while the window is minimized or the bubble unmapped
+        if not self.winfo_viewable():
+            return True
+        
+        # Only touch the timer label when the displayed tenth has changed
+        tenths = int((time.time() - self.start_time) * 10)
+        if tenths != self._timer_tenths:
+            self._timer_tenths = tenths
+            self.timer_label.configure(text=f"{tenths / 10:.1f}s")
         
         # Animate the thinking dots only when expanded
         if self.expanded:
             self.thinking_dots = (self.thinking_dots + 1) % 4
             dots = "." * self.thinking_dots
             self.thinking_label.configure(text=f"Thinking{dots}")
+        return True
+
+    @property
+    def copyable(self) -> bool:
+        """Whether the copy button applies; reasoning is copyable once expanded"""
+        return not self.is_reasoning or self.expanded
+
+    def _on_enter(self, event):
+        """Show the shared hover toolbar over this bubble"""
+        show = getattr(self.root, "show_hover_toolbar", None)
+        if callable(show):
+            show(self)
+
+    def _on_leave(self, event):
+        """Hide the shared hover toolbar once the pointer leaves this bubble"""
+        hide = getattr(self.root, "hide_hover_toolbar", None)
+        if callable(hide):
+            hide(self, event.x_root, event.y_root)
+
+    @property
+    def text(self) -> str:
+        """The full message text"""
+        if len(self._spans) > 1:
+            self._spans = ["".join(self._spans)]
+        return self._spans[0]
+
+    @text.setter
+    def text(self, value: str) -> None:
+        self._spans = [value]
+
+    def _create_textbox(self) -> None:
+        """Create the read-only textbox that shows the full message.
         
-        # Schedule next animation frame if still thinking
-        if self.is_thinking:
-            self.after(500, self.animate_thinking)
+        Streamed tokens are inserted at its end rather than re-rendering and
+        re-wrapping the whole text.
+        """
+        self.textbox = ctk.CTkTextbox(
+            self,
+            wrap="word",
+            fg_color="transparent",
+            border_width=0,
+            activate_scrollbars=False
+        )
+        self.textbox.configure(state="disabled")
+        # Last height applied by fit_textbox
+        self._fit_height = 0
+        self.textbox.bind("<Configure>", lambda e: self.fit_textbox())
+
+    def _insert_text(self, text: str) -> None:
+        """Insert text at the end of the read-only textbox and refit it"""
+        self.textbox.configure(state="normal")
+        self.textbox.insert("end", text)
+        self.textbox.configure(state="disabled")
+        self.fit_textbox()
+
+    def append_text(self, text: str) -> None:
+        """Append streamed text to the message textbox or reasoning content"""
+        self._spans.append(text)
+        if self.is_reasoning:
+            # Hidden content is brought up to date when it is next expanded
+            if self.expanded:
+                self._insert_text(text)
+                self._shown_chars += len(text)
+            if not self._preview_final:
+                # Only the head of the delta can still affect the preview
+                candidate = self._preview + text[:101]
+                self._preview = preview_text(candidate)
+                self._preview_final = self._preview != candidate
+                self.preview_label.configure(text=self._preview)
+            return
+        self._insert_text(text)
+
+    def fit_textbox(self) -> None:
+        """Size the textbox to its wrapped content so the bubble never scrolls.
+        
+        Measures through CTkTextbox's public yview() and dlineinfo(). The
+        height is only reconfigured when it changes, so the <Configure> event
+        a resize raises settles instead of re-running the resize.
+        """
+        try:
+            # Unmapped text has no layout to measure; <Configure> refits on map
+            if not self.textbox.winfo_ismapped():
+                return
+            first, last = self.textbox.yview()
+            bottom = self.textbox.dlineinfo("end-1c") if first <= 0.0 and last >= 1.0 else None
+            if bottom is not None:
+                # Everything is visible: stop just below the last display line
+                height = bottom[1] + bottom[3] + 8
+            else:
+                # Content is cut off: scale up by the visible fraction, growing
+                # at least a line so repeated passes always converge
+                line_height = self.textbox.cget("font").metrics("linespace")
+                estimate = int(self.textbox.winfo_height() / max(last - first, 0.01)) + 8
+                height = max(estimate, self._fit_height + line_height)
+            if height != self._fit_height:
+                self._fit_height = height
+                self.textbox.configure(height=height)
+        except Exception as e:
+            logging.error(f"Error sizing message textbox: {str(e)}")
 
-    def add_copy_button(self):
-        """Add copy button to the message bubble"""
-        if not self.copy_btn:
-            self.copy_btn = ctk.CTkButton(
-                self,
-                text="Copy",
-                width=60,
-                height=25,
-                command=self._copy_text
-            )
-            self.copy_btn.pack(side="right", padx=5, pady=5)
-            
     def _copy_text(self):
         """Copy text to clipboard"""
         if self.root:
@@ -232,18 +546,25 @@ class MessageBubble(ctk.CTkFrame):
         self.expanded = not self.expanded
         if self.expanded:
             self.preview_label.pack_forget()
-            self.content_label.pack(expand=True, fill="both", padx=10)
+            if not hasattr(self, 'textbox'):
+                self._create_textbox()
+            self.textbox.pack(expand=True, fill="both", padx=10)
+            # Only what streamed in while collapsed still needs inserting
+            missing = self.text[self._shown_chars:]
+            if missing:
+                self._insert_text(missing)
+                self._shown_chars += len(missing)
             self.thinking_label.pack(side="left", padx=5, pady=5)  # Show thinking label
-            # Show copy button when expanded
-            self.add_copy_button()
+            # The pointer is on the toggle button, so copying is available now
+            self._on_enter(None)
         else:
-            self.content_label.pack_forget()
+            self.textbox.pack_forget()
             self.thinking_label.pack_forget()  # Hide thinking label
             self.preview_label.pack(expand=True, fill="both", padx=10)
-            # Hide copy button when collapsed
-            if self.copy_btn:
-                self.copy_btn.destroy()
-                self.copy_btn = None
+            # Collapsed reasoning is not copyable
+            hide = getattr(self.root, "hide_hover_toolbar", None)
+            if callable(hide):
+                hide(self)
 
 class DeepSeekEngineerGUI(ctk.CTk):
     """A customtkinter-based GUI application for the DeepSeek Engineer interface.
@@ -254,11 +575,11 @@ class DeepSeekEngineerGUI(ctk.CTk):
     Attributes:
         db (DatabaseManager): Database manager instance for conversation storage
         conversation_id (str): Unique identifier for the current conversation
-        client (OpenAI): OpenAI client instance for API communication
+        async_client (AsyncOpenAI): OpenAI client used for streaming on the asyncio loop
         models (dict): Available DeepSeek models
         conversation_history (list): List of conversation messages
         message_widgets (list): List of message bubble widgets
-        workspace_files (list): List of files in the workspace
+        workspace_files (set): Absolute paths of files in the workspace
         api_balance (float): Current API credit balance
         
     Version 1.0.1:
@@ -283,10 +604,24 @@ class DeepSeekEngineerGUI(ctk.CTk):
         if not api_key:
             api_key = self.show_api_key_dialog()
         
-        self.client = OpenAI(
+        # openai pulls in httpx and friends; import it only once a client is needed
+        from openai import AsyncOpenAI
+        self.async_client = AsyncOpenAI(
             api_key=api_key,
             base_url="https://api.deepseek.com"
         )
+        
+        # Streamed tokens are buffered per bubble and appended at most once per frame
+        self._pending_tokens: Dict[MessageBubble, List[str]] = {}
+        self._token_lock = threading.Lock()
+        self._flush_scheduled = False
+        
+        # Scrolling to the newest message happens at most once per 50ms
+        self._scroll_scheduled = False
+        
+        # Dedicated asyncio loop so streaming never blocks the Tk mainloop
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="AsyncioLoop", daemon=True).start()
 
         # Available models
         self.models = {
@@ -302,23 +637,53 @@ class DeepSeekEngineerGUI(ctk.CTk):
         # Initialize message widgets list
         self.message_widgets = []
         
+        # Reasoning bubbles still thinking, animated by one shared 500ms tick
+        self._active_thinkers: List[weakref.ref] = []
+        self._thinker_tick_id = None
+        
         # Initialize thinking animation variables
         self.thinking_animation_id = None
         self.thinking_start_time = None
         self.current_thinking_label = None
         self.thinking_dots = 0  # Initialize thinking_dots here
+        # Thinking label found in each header frame, so ticks skip the child walk
+        self._thinking_label_cache: "weakref.WeakKeyDictionary[ctk.CTkFrame, ctk.CTkLabel]" = \
+            weakref.WeakKeyDictionary()
 
         # Initialize conversations list
         self.conversations = []
         self.current_conversation_name = "New Chat"
         
-        # Initialize workspace files
-        self.workspace_files = []  # Initialize workspace_files here
+        # Initialize workspace files; _injected_files holds those whose
+        # contents are already in the current conversation history
+        self.workspace_files = set()
+        self._injected_files = set()
+        
+        # File contents keyed by path, reused until the file's mtime changes
+        self._file_cache: Dict[str, tuple] = {}
         
-        # Initialize API balance
+        # Disk reads for added files and writes requested by the assistant run
+        # here so neither the Tk thread nor the stream blocks on them;
+        # _file_jobs holds the latest write per path so writes to one file
+        # stay in order
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="FileIO")
+        self._file_jobs: Dict[str, Future] = {}
+        self._file_jobs_lock = threading.Lock()
+        
+        # Initialize API balance; balance requests reuse one pooled keep-alive
+        # connection instead of a fresh TLS handshake each time
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=2, backoff_factor=0.2)  # Ride out transient failures
+        ))
+        self._http.headers.update({
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {api_key}'
+        })
         self.api_balance = 0.0
         self.api_balance_label = None
-        self.update_api_balance()  # Initial balance check
         
         # Initialize thinking time tracking
         self.total_thinking_time = 0.0
@@ -351,8 +716,9 @@ class DeepSeekEngineerGUI(ctk.CTk):
         # Create UI elements
         self.create_ui_elements()
         
-        # Start periodic API balance updates
-        self._start_periodic_balance_update()
+        # Fetch the balance in the background so the window is usable at once;
+        # after that it is refreshed when a completion finishes
+        self._refresh_api_balance_async()
         
     def create_sidebar(self):
         """Create the sidebar with conversation history"""
@@ -389,10 +755,12 @@ class DeepSeekEngineerGUI(ctk.CTk):
     def start_new_chat(self):
         """Start a new chat and save the current one"""
         # Save current conversation if it exists
+        # The history list is replaced below rather than cleared, so the
+        # saved conversation can keep it without copying
         if self.conversation_history:
             self.conversations.append({
                 "name": self.current_conversation_name,
-                "history": self.conversation_history.copy(),
+                "history": self.conversation_history,
                 "id": self.conversation_id
             })
             
@@ -403,10 +771,11 @@ class DeepSeekEngineerGUI(ctk.CTk):
         self.conversation_history = [
             {"role": "system", "content": self.get_system_prompt()}
         ]
+        self._injected_files.clear()
         
-        # Clear message widgets
-        for widget in self.message_widgets:
-            widget.destroy()
+        # Clear message widgets by tearing down their container in one go
+        self._bubbles_host.destroy()
+        self._create_bubbles_host()
         self.message_widgets.clear()
         
         # Reset thinking time for new conversation
@@ -417,7 +786,7 @@ class DeepSeekEngineerGUI(ctk.CTk):
         # Add to sidebar
         self.add_conversation_to_sidebar({
             "name": "New Chat",
-            "history": self.conversation_history.copy(),
+            "history": tuple(self.conversation_history),
             "id": self.conversation_id
         })
 
@@ -431,7 +800,7 @@ class DeepSeekEngineerGUI(ctk.CTk):
         """
         try:
             # Get current timestamp if not provided
-            timestamp = conversation.get('timestamp', datetime.now().strftime("%Y-%m-%d %H:%M"))
+            timestamp = conversation.get('timestamp', time.strftime("%Y-%m-%d %H:%M"))
             
             # Get current model if not provided
             model = conversation.get('model', self.model_var.get())
@@ -520,6 +889,23 @@ class DeepSeekEngineerGUI(ctk.CTk):
         self.conversation_frame = ctk.CTkScrollableFrame(self.main_frame)
         self.conversation_frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
         self.conversation_frame.grid_columnconfigure(0, weight=1)
+        self._create_bubbles_host()
+
+        # One copy toolbar shared by all bubbles, placed over the hovered one
+        self._hover_target: Optional[MessageBubble] = None
+        self._hover_toolbar = ctk.CTkFrame(self.conversation_frame, fg_color="transparent")
+        ctk.CTkButton(
+            self._hover_toolbar,
+            text="Copy",
+            width=60,
+            height=25,
+            command=self._copy_hover_target
+        ).pack(padx=5, pady=5)
+        self._hover_toolbar.bind(
+            "<Leave>",
+            lambda e: self._hover_target and self.hide_hover_toolbar(self._hover_target, e.x_root, e.y_root),
+            add="+"
+        )
 
         # Create input frame
         self.input_frame = ctk.CTkFrame(self.main_frame)
@@ -538,14 +924,57 @@ class DeepSeekEngineerGUI(ctk.CTk):
         )
         self.send_button.grid(row=0, column=1, padx=5, pady=5)
 
-        # Bind Enter key to send message
-        self.input_field.bind("<Return>", lambda e: self.send_message() if not e.state & 0x1 else None)
+        # Bind Enter key to send message (Shift+Enter inserts a newline)
+        self.input_field.bind("<Return>", self._on_return)
+
+    def _create_bubbles_host(self) -> None:
+        """Create the frame that holds every message bubble of the current chat."""
+        self._bubbles_host = ctk.CTkFrame(self.conversation_frame, fg_color="transparent")
+        self._bubbles_host.pack(fill="both", expand=True)
+
+    def show_hover_toolbar(self, bubble: MessageBubble) -> None:
+        """Place the shared copy toolbar in the corner of 'bubble'.
+        
+        Args:
+            bubble (MessageBubble): The bubble under the pointer
+        """
+        if not bubble.copyable:
+            return
+        self._hover_target = bubble
+        self._hover_toolbar.place(in_=bubble, relx=1.0, rely=1.0, anchor="se")
+        self._hover_toolbar.lift()
+
+    def hide_hover_toolbar(self, bubble: MessageBubble,
+                           x_root: Optional[int] = None, y_root: Optional[int] = None) -> None:
+        """Hide the shared copy toolbar if it is showing over 'bubble'.
+        
+        Args:
+            bubble (MessageBubble): The bubble the toolbar should leave
+            x_root (Optional[int]): Pointer x; the toolbar stays while it is over the bubble
+            y_root (Optional[int]): Pointer y
+        """
+        if self._hover_target is not bubble:
+            return
+        if x_root is not None and y_root is not None:
+            # Leave also fires when moving onto a child widget or the toolbar itself
+            widget = self.winfo_containing(x_root, y_root)
+            path = str(widget) if widget is not None else ""
+            for owner in (str(bubble), str(self._hover_toolbar)):
+                if path == owner or path.startswith(owner + "."):
+                    return
+        self._hover_toolbar.place_forget()
+        self._hover_target = None
+
+    def _copy_hover_target(self) -> None:
+        """Copy the text of the bubble the hover toolbar is showing over."""
+        if self._hover_target is not None and self._hover_target.winfo_exists():
+            self._hover_target._copy_text()
 
     def create_message_bubble(self, text: str, is_user: bool = True, is_reasoning: bool = False):
         """Create a message bubble for the chat"""
         # Create frame for the message
         bubble_frame = MessageBubble(
-            self.conversation_frame,
+            self._bubbles_host,
             text=text,
             is_user=is_user,
             is_reasoning=is_reasoning
@@ -573,230 +1002,260 @@ class DeepSeekEngineerGUI(ctk.CTk):
         """Add a file or directory to the workspace"""
         file_path = filedialog.askopenfilename(title="Select File")
         if file_path:
-            try:
-                # Store the file path in the workspace
-                if not hasattr(self, 'workspace_files'):
-                    self.workspace_files = set()
-                
-                abs_path = os.path.abspath(file_path)
-                self.workspace_files.add(abs_path)
-                
-                # Read the file content
-                content = read_local_file(abs_path)
-                
-                # Add file content as a user message
-                self.conversation_history.append({
-                    "role": "user",
-                    "content": f"I'm adding this file: {abs_path}\n\nFile contents:\n{content}"
-                })
-                
-                # Add assistant acknowledgment
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": f"I've received the file {os.path.basename(abs_path)}. I can help you analyze or modify this file. What would you like me to do with it?"
-                })
-                
-                # Show notification in UI
-                filename = os.path.basename(file_path)
-                self.append_to_conversation(f"Added file to workspace: {filename}", is_user=True)
-                self.append_to_conversation(f"I've received the file {filename}. I can help you analyze or modify this file. What would you like me to do with it?", is_user=False)
-                
-            except Exception as e:
-                self.append_to_conversation(f"Error adding file: {str(e)}", is_user=False)
+            future = self._io_pool.submit(self._load_file_blocking, file_path)
+            future.add_done_callback(lambda f: self.after(0, self._on_file_loaded, f))
 
-    def get_system_prompt(self) -> str:
-        return dedent("""\
-You are an elite software engineer called DeepSeek Engineer with decades of experience across all programming domains.
-Your expertise spans system design, algorithms, testing, and best practices.
-You provide thoughtful, well-structured solutions while explaining your reasoning.
+    def _load_file_blocking(self, file_path: str) -> tuple:
+        """Resolve and read a file picked in add_file_dialog; runs on the I/O pool.
+        
+        Returns:
+            tuple: (absolute path, user message carrying the file contents)
+        """
+        abs_path = os.path.abspath(file_path)
+        content = self._cached_read(abs_path)
+        return abs_path, f"I'm adding this file: {abs_path}\n\nFile contents:\n{content}"
 
-Core capabilities:
-1. Code Analysis & Discussion
-   - Analyze code with expert-level insight
-   - Explain complex concepts clearly
-   - Suggest optimizations and best practices
-   - Debug issues with precision
+    def _on_file_loaded(self, future: Future) -> None:
+        """Add a file loaded by _load_file_blocking to the workspace and conversation."""
+        try:
+            abs_path, message = future.result()
+            
+            # Store the file path in the workspace
+            self.workspace_files.add(abs_path)
+            
+            # Add file content as a user message
+            self.conversation_history.append({"role": "user", "content": message})
+            self._injected_files.add(abs_path)
+            
+            # Add assistant acknowledgment
+            filename = os.path.basename(abs_path)
+            self.conversation_history.append({
+                "role": "assistant",
+                "content": f"I've received the file {filename}. I can help you analyze or modify this file. What would you like me to do with it?"
+            })
+            
+            # Show notification in UI
+            self.append_to_conversation(f"Added file to workspace: {filename}", is_user=True)
+            self.append_to_conversation(f"I've received the file {filename}. I can help you analyze or modify this file. What would you like me to do with it?", is_user=False)
+            
+        except Exception as e:
+            self.append_to_conversation(f"Error adding file: {str(e)}", is_user=False)
+
+    def _cached_read(self, path: str) -> str:
+        """Return a file's text, re-reading it only when its mtime or size changed."""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        hit = self._file_cache.get(path)
+        if hit and hit[0] == stamp:
+            return hit[1]
+        content = read_local_file(path)
+        self._file_cache[path] = (stamp, content)
+        return content
 
-2. File Operations:
-   When files are added to the workspace:
-   - You can automatically read their contents
-   - You can analyze multiple files together
-   - You can make changes or create new files
-   - You will be notified when files are added
+    def get_system_prompt(self) -> str:
+        return _SYSTEM_PROMPT
 
-When working with files:
-1. First analyze the code and explain what you understand
-2. Propose specific changes or improvements
-3. Use the file operation JSON format to make changes
-4. Confirm what was changed and explain the improvements
+    def process_message(self, message: Optional[str] = None) -> Future:
+        """Stream a completion for the conversation on the asyncio loop.
+        
+        Args:
+            message (Optional[str]): User message to display and append to
+                the history before requesting the completion
+            
+        Returns:
+            Future: Completes when the response has been fully processed
+        """
+        if message:
+            self.append_to_conversation(message, is_user=True)
+            self.conversation_history.append({"role": "user", "content": message})
+        # Tk variables and the workspace sets belong to this thread; hand the
+        # coroutine what it needs instead of letting it read them
+        model = self.models[self.model_var.get()]
+        pending_files = list(self.workspace_files - self._injected_files)
+        return asyncio.run_coroutine_threadsafe(
+            self._process_message_async(model, pending_files), self._loop)
+
+    def _run_on_ui(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future":
+        """Run 'fn' on the Tk thread and return an awaitable for its result."""
+        future: Future = Future()
+        
+        def run() -> None:
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        
+        self.after(0, run)
+        return asyncio.wrap_future(future)
 
-Output Format for File Operations:
-{
-  "assistant_reply": "Your explanation of the changes",
-  "files_to_create": [
-    {
-      "path": "relative/path/to/new/file",
-      "content": "complete file content with proper formatting"
-    }
-  ],
-  "files_to_edit": [
-    {
-      "path": "path/to/file",
-      "original_snippet": "exact code to replace (include enough context)",
-      "new_snippet": "new code with proper indentation"
-    }
-  ]
-}
+    def _enqueue_token(self, target: MessageBubble, token: str) -> None:
+        """Queue a streamed token for 'target', scheduling a repaint if none is pending.
+        
+        Args:
+            target (MessageBubble): Bubble the text is appended to
+            token (str): Streamed text to append
+        
+        Safe to call from any thread.
+        """
+        with self._token_lock:
+            self._pending_tokens.setdefault(target, []).append(token)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.after(30, self._flush_token_queues)
+
+    def _flush_token_queues(self) -> None:
+        """Append every queued token with a single insert per bubble."""
+        with self._token_lock:
+            pending, self._pending_tokens = self._pending_tokens, {}
+            self._flush_scheduled = False
+        for bubble, tokens in pending.items():
+            try:
+                bubble.append_text("".join(tokens))
+            except Exception as e:
+                logging.error(f"Error flushing streamed tokens: {str(e)}")
+        if pending:
+            self._mark_scroll_dirty()
 
-Guidelines:
-1. When a file is added:
-   - Automatically read and analyze it
-   - Suggest improvements if needed
-   - Make changes using the JSON format
-2. For new files:
-   - Include complete, properly formatted code
-   - Add necessary imports and dependencies
-3. For editing files:
-   - Use precise, minimal edits
-   - Maintain code style and formatting
-4. After changes:
-   - Confirm what was changed
-   - Explain how to test the changes
+    def _mark_scroll_dirty(self) -> None:
+        """Scroll the conversation to the bottom, at most once per 50ms."""
+        if self._scroll_scheduled:
+            return
+        self._scroll_scheduled = True
+        self.after(50, self._flush_scroll)
 
-Remember: You're a senior engineer - be thorough, precise, and thoughtful in your solutions.
-""")
+    def _flush_scroll(self) -> None:
+        self._scroll_scheduled = False
+        try:
+            self.conversation_frame._parent_canvas.yview_moveto(1.0)
+        except Exception as e:
+            logging.error(f"Error scrolling conversation: {str(e)}")
 
-    def process_message(self):
+    async def _process_message_async(self, model: str, pending_files: List[str]) -> None:
+        # Everything this turn stores is committed in one transaction, by the
+        # Tk thread once the callbacks queued below have run
+        self.db.begin_batch()
         try:
-            # Get the selected model
-            model = self.models[self.model_var.get()]
+            # Add the workspace files that aren't in the history yet
+            for file_path in pending_files:
+                try:
+                    content = await asyncio.to_thread(self._cached_read, file_path)
+                    # Add file as user message
+                    self.conversation_history.append({
+                        "role": "user",
+                        "content": f"I'm adding this file: {file_path}\n\nFile contents:\n{content}"
+                    })
+                    # Add assistant acknowledgment
+                    self.conversation_history.append({
+                        "role": "assistant",
+                        "content": f"I've received the file {os.path.basename(file_path)}. I can help you analyze or modify this file. What would you like me to do with it?"
+                    })
+                    self.after(0, self._injected_files.add, file_path)
+                except Exception as e:
+                    self.after(0, lambda e=e, file_path=file_path: self.append_to_conversation(
+                        f"Error reading {file_path}: {str(e)}", is_user=False))
             
             # Prepare conversation history based on model
             if model == "deepseek-reasoner":
                 # For reasoner, ensure system message is first
-                messages = [{"role": "system", "content": self.get_system_prompt()}]
+                messages = [{"role": "system", "content": _SYSTEM_PROMPT}]
                 # Add other messages, skipping any previous system messages
                 messages.extend([msg for msg in self.conversation_history if msg["role"] != "system"])
             else:
                 # For chat model, use history as is
                 messages = self.conversation_history
             
-            # If we have workspace files that aren't in the history, add them
-            if hasattr(self, 'workspace_files') and self.workspace_files:
-                for file_path in self.workspace_files:
-                    # Check if this file is already in the conversation
-                    if not any(file_path in msg.get('content', '') for msg in self.conversation_history):
-                        try:
-                            content = read_local_file(file_path)
-                            # Add file as user message
-                            messages.append({
-                                "role": "user",
-                                "content": f"I'm adding this file: {file_path}\n\nFile contents:\n{content}"
-                            })
-                            # Add assistant acknowledgment
-                            messages.append({
-                                "role": "assistant",
-                                "content": f"I've received the file {os.path.basename(file_path)}. I can help you analyze or modify this file. What would you like me to do with it?"
-                            })
-                        except Exception as e:
-                            self.append_to_conversation(f"Error reading {file_path}: {str(e)}", is_user=False)
-            
             # Get completion from API
-            completion = self.client.chat.completions.create(
+            completion = await self.async_client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=0.7,
                 stream=True
             )
 
-            # Process the streaming response
-            collected_chunks = []
-            json_started = False
-            json_content = ""
+            # Process the streaming response; text accumulates in lists that
+            # are joined once rather than growing strings token by token.
+            # A JSON reply is the slice of content_parts from json_start on
+            json_start: Optional[int] = None
             current_response = None
             current_reasoning = None
-            reasoning_content = ""
-            content = ""
+            reasoning_parts: List[str] = []
+            content_parts: List[str] = []
+            is_reasoner = model == "deepseek-reasoner"
+            thinking_stopped = False
             
-            for chunk in completion:
+            async for chunk in completion:
+                delta = chunk.choices[0].delta
+                
                 # Handle reasoning content for deepseek-reasoner model
-                if model == "deepseek-reasoner" and hasattr(chunk.choices[0].delta, 'reasoning_content'):
-                    token = chunk.choices[0].delta.reasoning_content
+                if is_reasoner:
+                    token = getattr(delta, 'reasoning_content', None)
                     if token is not None:
-                        reasoning_content += token
+                        reasoning_parts.append(token)
                         
                         # Update or create reasoning bubble
                         if current_reasoning is None and token.strip():
-                            current_reasoning = self.append_to_conversation("", is_user=False, is_reasoning=True)
+                            current_reasoning = await self._run_on_ui(
+                                self.append_to_conversation, "", is_user=False, is_reasoning=True)
                             # Start thinking animation for the header label
-                            self.start_thinking_animation(current_reasoning.header_frame)
+                            self.after(0, self.start_thinking_animation, current_reasoning.header_frame)
                         
                         if current_reasoning:
-                            # Get the content label from the content frame
-                            content_frame = current_reasoning.content_frame
-                            label = content_frame.winfo_children()[0]
-                            current_text = label.cget("text")
-                            label.configure(text=current_text + token)
+                            self._enqueue_token(current_reasoning, token)
                 
                 # Handle regular content
-                if chunk.choices[0].delta.content is not None:
-                    # If we were showing thinking animation, stop it
-                    if current_reasoning:
-                        self.stop_thinking_animation()
+                token = delta.content
+                if token is not None:
+                    # If we were showing thinking animation, stop it (once,
+                    # not with a Tk round-trip for every content token)
+                    if current_reasoning and not thinking_stopped:
+                        thinking_stopped = True
+                        self.after(0, self.stop_thinking_animation)
                     
-                    token = chunk.choices[0].delta.content
-                    collected_chunks.append(token)
-                    content += token
+                    content_parts.append(token)
                     
                     # Check if this is the start of JSON
-                    if not json_started and token.strip().startswith("{"):
-                        json_started = True
-                        json_content = token
-                        continue
+                    if json_start is None and token.strip().startswith("{"):
+                        json_start = len(content_parts) - 1
+                        # The reply is handled whole once it closes
+                        json_scanner = JsonStreamScanner(capture_members=False)
                     
-                    if json_started:
-                        json_content += token
-                        # Try to parse the JSON to see if it's complete
-                        try:
-                            json.loads(json_content)
-                            # If we get here, JSON is valid and complete
-                            self.handle_assistant_response(json_content)
-                            json_started = False
-                            json_content = ""
-                        except json.JSONDecodeError:
-                            # JSON is not complete yet, keep collecting
-                            continue
+                    if json_start is not None:
+                        # Parse only once the scanner sees the outermost brace close
+                        if json_scanner.feed(token):
+                            self.after(0, self.handle_assistant_response, "".join(content_parts[json_start:]))
+                            json_start = None
                     else:
                         # Only create response bubble when we have actual content to show
                         if current_response is None and token.strip():
-                            current_response = self.append_to_conversation("", is_user=False)
+                            current_response = await self._run_on_ui(
+                                self.append_to_conversation, "", is_user=False)
                         
                         if current_response:
                             # Update the current response with new token
-                            message_label = current_response.winfo_children()[0]
-                            current_text = message_label.cget("text")
-                            message_label.configure(text=current_text + token)
+                            self._enqueue_token(current_response, token)
 
             # Make sure to stop thinking animation if it's still running
-            self.stop_thinking_animation()
-
-            # Join all chunks for the final response
-            full_response = "".join(collected_chunks)
+            self.after(0, self.stop_thinking_animation)
 
             # If we still have incomplete JSON content, try one last time
-            if json_started and json_content:
-                try:
-                    self.handle_assistant_response(json_content)
-                except json.JSONDecodeError as e:
-                    self.append_to_conversation(f"Error parsing JSON response: {str(e)}", is_user=False)
+            if json_start is not None:
+                self.after(0, self.handle_assistant_response, "".join(content_parts[json_start:]))
 
             # Add to conversation history (excluding reasoning content)
-            self.conversation_history.append({"role": "assistant", "content": content})
+            self.conversation_history.append({"role": "assistant", "content": "".join(content_parts)})
+            
+            # The request has been billed; pick up the new balance
+            self._refresh_api_balance_async()
 
         except Exception as e:
-            self.stop_thinking_animation()  # Make sure to stop animation on error
-            self.append_to_conversation(f"Error: {str(e)}", is_user=False)
+            # Make sure to stop animation on error
+            self.after(0, self.stop_thinking_animation)
+            self.after(0, lambda e=e: self.append_to_conversation(f"Error: {str(e)}", is_user=False))
         finally:
+            # Queued after the response and error callbacks so what they store
+            # lands in the same transaction
+            self.after(0, self.db.commit_batch)
             # Re-enable input
             self.after(0, lambda: self.input_field.configure(state="normal"))
             self.after(0, lambda: self.send_button.configure(state="normal"))
@@ -814,63 +1273,31 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             - Added proper return types
         """
         try:
-            # Parse the response text as JSON
-            response_data = json.loads(response_text)
+            # Plain prose is the common case; show it without attempting a parse
+            stripped = response_text.lstrip()
+            if not stripped or stripped[0] not in '{[':
+                self.append_to_conversation(response_text, is_user=False)
+                return
             
-            # Handle files_to_create
-            if 'files_to_create' in response_data:
-                files_to_create = response_data.get('files_to_create', []) or []
-                if isinstance(files_to_create, dict):
-                    files_to_create = [files_to_create]
-                response_data['files_to_create'] = [
-                    FileToCreate(**item) if isinstance(item, dict) else item 
-                    for item in files_to_create
-                ]
-            else:
-                response_data['files_to_create'] = []
-                
-            # Handle files_to_edit
-            if 'files_to_edit' in response_data:
-                files_to_edit = response_data.get('files_to_edit', []) or []
-                if isinstance(files_to_edit, dict):
-                    files_to_edit = [files_to_edit]
-                response_data['files_to_edit'] = [
-                    FileToEdit(**item) if isinstance(item, dict) else item 
-                    for item in files_to_edit
-                ]
-            else:
-                response_data['files_to_edit'] = []
+            # Parse the response text as JSON
+            response_data = _json_loads(response_text)
             
-            # Convert response to proper objects
-            response = AssistantResponse(**response_data)
-
             # Display the assistant's reply first
-            self.append_to_conversation(response.assistant_reply, is_user=False)
-
-            # Handle file creations
-            if response.files_to_create:
-                for file in response.files_to_create:
-                    try:
-                        # Ensure path is relative to current directory
-                        if os.path.isabs(file.path):
-                            file.path = os.path.relpath(file.path)
-                        
-                        create_file(file.path, file.content)
-                        self.append_to_conversation(f"✓ Created file: {file.path}", is_user=False)
-                    except Exception as e:
-                        logging.error(f"Error creating file {file.path}: {str(e)}")
-                        self.append_to_conversation(f"❌ Error creating file {file.path}: {str(e)}", is_user=False)
-
-            # Handle file edits
-            if response.files_to_edit:
-                for file in response.files_to_edit:
-                    try:
-                        result = apply_diff_edit(file.path, file.original_snippet, file.new_snippet)
-                        if result:  # Only show success message if edit was successful
-                            self.append_to_conversation(f"✓ Updated file: {file.path}", is_user=False)
-                    except Exception as e:
-                        logging.error(f"Error editing file {file.path}: {str(e)}")
-                        self.append_to_conversation(f"❌ Error editing file {file.path}: {str(e)}", is_user=False)
+            self.append_to_conversation(response_data['assistant_reply'], is_user=False)
+
+            # File operations are read straight from the parsed dicts; a
+            # single object is accepted in place of a list
+            files_to_create = response_data.get('files_to_create') or []
+            if isinstance(files_to_create, dict):
+                files_to_create = [files_to_create]
+            for item in files_to_create:
+                self._create_response_file(item)
+
+            files_to_edit = response_data.get('files_to_edit') or []
+            if isinstance(files_to_edit, dict):
+                files_to_edit = [files_to_edit]
+            for item in files_to_edit:
+                self._edit_response_file(item)
                     
         except json.JSONDecodeError as e:
             logging.error(f"Error parsing assistant response: {str(e)}")
@@ -879,6 +1306,103 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             logging.error(f"Unexpected error in handle_assistant_response: {str(e)}")
             self.append_to_conversation(f"❌ Unexpected error: {str(e)}", is_user=False)
 
+    def _submit_file_job(self, path: str, fn: Callable[..., Any], *args: Any) -> Future:
+        """Run 'fn' on the I/O pool once every earlier job for 'path' has finished.
+        
+        Args:
+            path (str): File the job writes
+            fn (Callable[..., Any]): Blocking function to run
+            *args: Arguments for 'fn'
+        
+        Returns:
+            Future: Resolves to the result of 'fn'
+        """
+        key = os.path.abspath(path)
+        with self._file_jobs_lock:
+            previous = self._file_jobs.get(key)
+            
+            def run() -> Any:
+                # The pool runs jobs in submission order, so 'previous' has started
+                if previous is not None:
+                    wait([previous])
+                return fn(*args)
+            
+            future = self._io_pool.submit(run)
+            self._file_jobs[key] = future
+        
+        def forget(done: Future) -> None:
+            with self._file_jobs_lock:
+                if self._file_jobs.get(key) is done:
+                    del self._file_jobs[key]
+        
+        future.add_done_callback(forget)
+        return future
+
+    def _create_response_file(self, item: Dict[str, str]) -> None:
+        """Write one file requested by the assistant in the background.
+        
+        Args:
+            item (Dict[str, str]): A files_to_create entry with 'path' and 'content'
+        """
+        path = item['path']
+        # Ensure path is relative to current directory
+        if os.path.isabs(path):
+            path = os.path.relpath(path)
+        
+        future = self._submit_file_job(path, create_file, path, item['content'])
+        future.add_done_callback(
+            lambda f: self.after(0, self._report_file_created, path, f))
+
+    def _report_file_created(self, path: str, future: Future) -> None:
+        """Show the outcome of a background file creation."""
+        error = future.exception()
+        if error is None:
+            self.append_to_conversation(f"✓ Created file: {path}", is_user=False)
+        else:
+            logging.error(f"Error creating file {path}: {str(error)}")
+            self.append_to_conversation(f"❌ Error creating file {path}: {str(error)}", is_user=False)
+
+    def _edit_response_file(self, item: Dict[str, str]) -> None:
+        """Apply one edit requested by the assistant in the background.
+        
+        Args:
+            item (Dict[str, str]): A files_to_edit entry with 'path',
+                'original_snippet' and 'new_snippet'
+        """
+        path = item['path']
+        future = self._submit_file_job(
+            path, apply_diff_edit, path, item['original_snippet'], item['new_snippet'])
+        future.add_done_callback(
+            lambda f: self.after(0, self._report_file_edited, path, f))
+
+    def _report_file_edited(self, path: str, future: Future) -> None:
+        """Show the outcome of a background file edit."""
+        error = future.exception()
+        if error is None:
+            if future.result():  # Only show success message if edit was successful
+                self.append_to_conversation(f"✓ Updated file: {path}", is_user=False)
+        else:
+            logging.error(f"Error editing file {path}: {str(error)}")
+            self.append_to_conversation(f"❌ Error editing file {path}: {str(error)}", is_user=False)
+
+    def _handle_response_value(self, key: str, value: Any) -> None:
+        """Act on one member of a streamed JSON reply as soon as it has closed.
+        
+        Args:
+            key (str): Name of the top-level member
+            value (Any): The decoded member, or one element of it for arrays
+        """
+        try:
+            if key == "assistant_reply":
+                self.append_to_conversation(value, is_user=False)
+            elif key == "files_to_create":
+                self._create_response_file(value)
+            elif key == "files_to_edit":
+                self._edit_response_file(value)
+        except Exception as e:
+            logging.error(f"Error handling streamed {key}: {str(e)}")
+            self.append_to_conversation(f"❌ Unexpected error: {str(e)}", is_user=False)
+
     def get_api_balance(self) -> float:
         """Get the current API credit balance.
         
@@ -891,12 +1415,8 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             - Added type hints
         """
         try:
-            response = requests.get(
+            response = self._http.get(
                 "https://api.deepseek.com/user/balance",
-                headers={
-                    'Accept': 'application/json',
-                    'Authorization': f'Bearer {self.client.api_key}'
-                },
                 timeout=10  # Add timeout to prevent hanging
             )
             response.raise_for_status()  # Raise exception for bad status codes
@@ -915,17 +1435,41 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
     def update_api_balance(self) -> None:
         """Update the API balance display.
         
+        The request runs off the Tk thread; the label is updated via after(0)
+        once it returns, so this never blocks the caller.
+        
         Version 1.0.1:
             - Added type hints
             - Added error handling
         """
+        self._refresh_api_balance_async()
+
+    def _show_api_balance(self, balance: float) -> None:
+        """Store 'balance' and show it in the controls bar."""
         try:
-            self.api_balance = self.get_api_balance()
+            # The label already shows this balance; skip the reconfigure
+            if abs(balance - self.api_balance) < 1e-4:
+                return
+            self.api_balance = balance
             if hasattr(self, 'api_balance_label') and self.api_balance_label:
                 self.api_balance_label.configure(text=f"API Credits: ${self.api_balance:.2f}")
         except Exception as e:
             logging.error(f"Error updating API balance display: {str(e)}")
 
+    def _refresh_api_balance_async(self) -> Future:
+        """Fetch the API balance off the Tk thread and update the label when it arrives.
+        
+        Safe to call from any thread.
+        
+        Returns:
+            Future: Completes once the balance has been fetched
+        """
+        return asyncio.run_coroutine_threadsafe(self._refresh_api_balance(), self._loop)
+
+    async def _refresh_api_balance(self) -> None:
+        balance = await asyncio.to_thread(self.get_api_balance)
+        self.after(0, self._show_api_balance, balance)
+
     def copy_to_clipboard(self, text: str) -> None:
         """Copy text to clipboard
         
@@ -943,6 +1487,17 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             logging.error(f"Error copying to clipboard: {str(e)}")
             self.append_to_conversation("❌ Failed to copy text to clipboard", is_user=False)
 
+    def _on_return(self, event) -> Optional[str]:
+        """Send the message on Enter, letting Shift+Enter insert a newline.
+        
+        Returns:
+            Optional[str]: "break" to skip Tk's default newline insertion
+        """
+        if event.state & 0x1:
+            return None
+        self.send_message()
+        return "break"
+
     def send_message(self) -> None:
         """Send a message to the assistant and process the response.
         
@@ -971,11 +1526,8 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             # Get selected model
             selected_model = self.models[self.model_var.get()]
             
-            # Create completion in a separate thread
-            threading.Thread(target=self._process_completion, args=(selected_model,), daemon=True).start()
-            
-            # Update API balance after request
-            threading.Thread(target=self.update_api_balance, daemon=True).start()
+            # Stream the completion on the asyncio loop
+            asyncio.run_coroutine_threadsafe(self._process_completion(selected_model), self._loop)
             
         except Exception as e:
             logging.error(f"Error sending message: {str(e)}")
@@ -984,25 +1536,11 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             self.input_field.configure(state="normal")
             self.send_button.configure(state="normal")
 
-    def _start_periodic_balance_update(self) -> None:
-        """Start periodic API balance updates every 5 minutes.
+    async def _process_completion(self, model: str) -> None:
+        """Process the completion request on the asyncio loop
         
-        Version 1.0.1:
-            - Added type hints
-            - Added error handling
-        """
-        def update_loop() -> None:
-            while True:
-                try:
-                    self.update_api_balance()
-                except Exception as e:
-                    logging.error(f"Error in balance update loop: {str(e)}")
-                time.sleep(300)  # 5 minutes
-                
-        threading.Thread(target=update_loop, daemon=True).start()
-
-    def _process_completion(self, model: str) -> None:
-        """Process the completion request in a separate thread
+        Widgets are only touched through after(0) or _run_on_ui, so the
+        stream never blocks the Tk thread.
         
         Version 1.0.4:
             - Added proper thinking animation handling
@@ -1010,74 +1548,114 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             - Improved error handling
             - Enhanced content updates
         """
+        # Initialize response buffers; each is joined once at the end
+        reasoning_chunks: List[str] = []
+        content_parts: List[str] = []
+        completion = None
+        reasoning_bubble = None
+        # Thinking time runs from the first reasoning token to the last
+        reasoning_started = reasoning_ended = 0.0
+        
+        # The reasoning is stored with the usage and thinking time before any
+        # reply member, so it keeps its place in the history. A request that
+        # fails mid-stream has still been billed and is recorded too
+        turn_recorded = False
+        
+        def record_turn() -> None:
+            nonlocal turn_recorded
+            turn_recorded = True
+            self.db.record_turn(
+                "assistant", "".join(reasoning_chunks) if reasoning_bubble else None, self.conversation_id,
+                0.002,  # Approximate usage
+                reasoning_ended - reasoning_started, is_reasoning=True
+            )
+        
         try:
             # Start thinking animation
-            self.start_thinking_animation(self.current_thinking_label)
+            self.after(0, self.start_thinking_animation, self.current_thinking_label)
             
             # Get completion from API
-            completion = self.client.chat.completions.create(
+            completion = await self.async_client.chat.completions.create(
                 model=model,
                 messages=self.conversation_history,
                 temperature=0.7,
                 stream=True
             )
             
-            # Record API usage
-            self.db.add_api_usage(0.002, "chat_completion", self.conversation_id)  # Approximate usage
-            
-            # Initialize response buffers
-            reasoning_text = ""
-            response_text = ""
-            
-            # Create reasoning bubble immediately
-            reasoning_bubble = None
+            # Members of a JSON reply are dispatched to the Tk thread with
+            # after(0) as soon as each one closes, file writes going on to the
+            # I/O pool; json_reply stays None until the first non-blank token
+            # decides it
+            json_reply = None
+            json_done = False
+            scanner = JsonStreamScanner()
             
             # Process the streaming response
-            for chunk in completion:
+            async for chunk in completion:
+                delta = chunk.choices[0].delta
+                reasoning = getattr(delta, 'reasoning_content', None)
+                token = getattr(delta, 'content', None)
+                
                 # Handle reasoning content
-                if hasattr(chunk.choices[0].delta, 'reasoning_content') and chunk.choices[0].delta.reasoning_content:
+                if reasoning:
+                    reasoning_ended = time.time()
                     if not reasoning_bubble:
-                        reasoning_bubble = self.append_to_conversation("", is_user=False, is_reasoning=True)
-                    reasoning_text += chunk.choices[0].delta.reasoning_content
-                    reasoning_bubble.text = reasoning_text
+                        reasoning_started = reasoning_ended
+                        # Persisted by record_turn() with the rest of the turn
+                        reasoning_bubble = await self._run_on_ui(
+                            self.append_to_conversation, "", is_user=False, is_reasoning=True, persist=False)
+                    reasoning_chunks.append(reasoning)
                     
-                    # Update content label
-                    if hasattr(reasoning_bubble, 'content_label'):
-                        reasoning_bubble.content_label.configure(text=reasoning_text)
-                    
-                    # Update preview label with first line or truncated text
-                    if hasattr(reasoning_bubble, 'preview_label'):
-                        preview = reasoning_text.split('\n')[0] if reasoning_text else ""
-                        if len(preview) > 100:
-                            preview = preview[:100] + "..."
-                        elif len(reasoning_text.split('\n')) > 1:
-                            preview += "..."
-                        reasoning_bubble.preview_label.configure(text=preview)
+                    # The bubble's text and labels are updated once per frame
+                    self._enqueue_token(reasoning_bubble, reasoning)
             
                 # Handle final content
-                if hasattr(chunk.choices[0].delta, 'content') and chunk.choices[0].delta.content:
-                    response_text += chunk.choices[0].delta.content
+                if token:
+                    if not turn_recorded:
+                        record_turn()
+                    content_parts.append(token)
+                    if json_reply is None and token.strip():
+                        json_reply = token.lstrip().startswith("{")
+                    if json_reply and not json_done:
+                        json_done = scanner.feed(token)
+                        for key, value in scanner.values:
+                            self.after(0, self._handle_response_value, key, value)
+                        scanner.values.clear()
         
             # Stop thinking animation for reasoning bubble
             if reasoning_bubble:
-                reasoning_bubble.stop_thinking()
+                self.after(0, reasoning_bubble.stop_thinking)
+            
+            if not turn_recorded:
+                record_turn()
         
-            # Handle the complete response
-            if response_text:
-                self.handle_assistant_response(response_text)
+            # A finished JSON reply has been handled already; anything else
+            # (plain text or JSON cut off mid-stream) is handled whole
+            response_text = "".join(content_parts)
+            if response_text and not json_done:
+                self.after(0, self.handle_assistant_response, response_text)
+            
+            # Add to conversation history (excluding reasoning content)
+            self.conversation_history.append({"role": "assistant", "content": response_text})
+            
+            # The request has been billed; pick up the new balance
+            self._refresh_api_balance_async()
         
         except Exception as e:
-            self.append_to_conversation(f"Error: {str(e)}", is_user=False)
+            if completion is not None and not turn_recorded:
+                record_turn()
+            self.after(0, lambda e=e: self.append_to_conversation(f"Error: {str(e)}", is_user=False))
         finally:
             # Stop thinking animation
-            self.stop_thinking_animation()
+            self.after(0, self.stop_thinking_animation)
             
             # Re-enable input
-            self.input_field.configure(state="normal")
-            self.send_button.configure(state="normal")
+            self.after(0, lambda: self.input_field.configure(state="normal"))
+            self.after(0, lambda: self.send_button.configure(state="normal"))
 
     def append_to_conversation(self, text: str, replace_last_line: bool = False, 
-                             is_user: bool = False, is_reasoning: bool = False) -> MessageBubble:
+                             is_user: bool = False, is_reasoning: bool = False,
+                             persist: bool = True) -> MessageBubble:
         """Add a new message to the conversation
         
         Args:
@@ -1085,6 +1663,7 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             replace_last_line (bool): Whether to replace the last line
             is_user (bool): Whether this is a user message
             is_reasoning (bool): Whether this is a reasoning message
+            persist (bool): Whether to store the message in the database
         
         Returns:
             MessageBubble: The created message bubble widget
@@ -1097,7 +1676,7 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
         try:
             # Create message bubble
             bubble = MessageBubble(
-                self.conversation_frame,
+                self._bubbles_host,
                 text=text,
                 is_user=is_user,
                 is_reasoning=is_reasoning
@@ -1105,19 +1684,20 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             bubble.pack(fill="x", padx=10, pady=5)
             
             # Store in database
-            role = "user" if is_user else "assistant"
-            self.db.add_chat_message(role, text, self.conversation_id, is_reasoning)
+            if persist:
+                role = "user" if is_user else "assistant"
+                self.db.add_chat_message(role, text, self.conversation_id, is_reasoning)
             
             # Update UI
             self.message_widgets.append(bubble)
-            self.conversation_frame._parent_canvas.yview_moveto(1.0)
+            self._mark_scroll_dirty()
             
             return bubble
         except Exception as e:
             logging.error(f"Error appending to conversation: {str(e)}")
             # Create a simple error message if bubble creation fails
             error_bubble = MessageBubble(
-                self.conversation_frame,
+                self._bubbles_host,
                 text=f"❌ Error displaying message: {str(e)}",
                 is_user=False
             )
@@ -1143,14 +1723,16 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
                 return
                 
             # Get the thinking label from the header frame
-            thinking_label = None
-            for child in header_frame.winfo_children():
-                if isinstance(child, ctk.CTkLabel) and "Thinking" in child.cget("text"):
-                    thinking_label = child
-                    break
-                    
-            if not thinking_label:
-                return
+            thinking_label = self._thinking_label_cache.get(header_frame)
+            if thinking_label is None:
+                for child in header_frame.winfo_children():
+                    if isinstance(child, ctk.CTkLabel) and "Thinking" in child.cget("text"):
+                        thinking_label = child
+                        break
+                        
+                if not thinking_label:
+                    return
+                self._thinking_label_cache[header_frame] = thinking_label
                 
             # Update dots
             self.thinking_dots = (self.thinking_dots + 1) % 4
@@ -1158,11 +1740,34 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             thinking_label.configure(text=f"Thinking{dots}")
             
             # Schedule next animation frame
-            self.thinking_animation_id = self.after(500, lambda: self.animate_thinking(header_frame))
+            self.thinking_animation_id = self.after(500, self.animate_thinking, header_frame)
             
         except Exception as e:
             logging.error(f"Error in thinking animation: {str(e)}")
 
+    def register_thinker(self, bubble: MessageBubble) -> None:
+        """Animate 'bubble' on the shared thinking tick until it stops thinking.
+        
+        Args:
+            bubble (MessageBubble): Reasoning bubble to animate
+        """
+        self._active_thinkers.append(weakref.ref(bubble))
+        if self._thinker_tick_id is None:
+            self._thinker_tick_id = self.after(500, self._tick_thinkers)
+
+    def _tick_thinkers(self) -> None:
+        """Advance every active reasoning bubble, re-arming only while any remain."""
+        alive = []
+        for ref in self._active_thinkers:
+            bubble = ref()
+            try:
+                if bubble is not None and bubble.winfo_exists() and bubble._update_thinking_display():
+                    alive.append(ref)
+            except Exception as e:
+                logging.error(f"Error in thinking animation: {str(e)}")
+        self._active_thinkers = alive
+        self._thinker_tick_id = self.after(500, self._tick_thinkers) if alive else None
+
     def start_thinking_animation(self, header_frame: ctk.CTkFrame) -> None:
         """Start the thinking animation and timer
         
@@ -1211,7 +1816,14 @@ Remember: You're a senior engineer - be thorough, precise, and thoughtful in you
             
 def main():
     app = DeepSeekEngineerGUI()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        app._loop.call_soon_threadsafe(app._loop.stop)
+        app._io_pool.shutdown(wait=False, cancel_futures=True)
+        app._http.close()
+        # Commit any chat rows still queued for the background writer
+        app.db.close()
 
 if __name__ == "__main__":
     main()
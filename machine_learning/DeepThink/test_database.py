@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from database import DatabaseManager
+
+def test_default_path_from_env(monkeypatch, tmp_path):
+    """Test that the database path defaults to DEEPSEEK_DB_PATH"""
+    path = tmp_path / "history.db"
+    monkeypatch.setenv("DEEPSEEK_DB_PATH", str(path))
+    manager = DatabaseManager()
+    try:
+        assert manager.db_path == str(path)
+        assert path.exists()
+    finally:
+        manager.close()
+
+def test_chat_history(db):
+    """Test that messages come back in insertion order per conversation"""
+    db.add_chat_message("user", "Hello", "conv1")
+    db.add_chat_messages([
+        ("assistant", "Thinking it over", "conv1", True),
+        ("assistant", "Hi there", "conv1", False),
+        ("user", "Other chat", "conv2", False),
+    ])
+    assert db.get_chat_history("conv1") == [
+        {"role": "user", "content": "Hello", "is_reasoning": False},
+        {"role": "assistant", "content": "Thinking it over", "is_reasoning": True},
+        {"role": "assistant", "content": "Hi there", "is_reasoning": False},
+    ]
+    assert list(db.iter_chat_history("conv2")) == db.get_chat_history("conv2")
+
+def test_history_cache_invalidated_on_insert(db):
+    """Test that a cached history picks up new messages"""
+    db.add_chat_message("user", "First", "conv1")
+    assert len(db.get_chat_history("conv1")) == 1
+    db.add_chat_message("user", "Second", "conv1")
+    assert len(db.get_chat_history("conv1")) == 2
+
+def test_unknown_role(db):
+    """Test that roles outside the lookup table are rejected"""
+    with pytest.raises(ValueError):
+        db.add_chat_message("bogus", "text", "conv1")
+
+def test_totals(db):
+    """Test running credit and thinking time totals"""
+    db.add_api_usage(0.5, "chat_completion", "conv1")
+    db.add_api_usages([(0.25, "chat_completion", "conv1"), (1.0, "chat_completion", "conv2")])
+    db.add_thinking_time(2.0, "conv1")
+    assert db.get_total_credits_used("conv1") == pytest.approx(0.75)
+    assert db.get_total_credits_used() == pytest.approx(1.75)
+    assert db.get_total_thinking_time("conv1") == pytest.approx(2.0)
+    assert db.get_total_thinking_time("missing") == 0.0
+
+def test_record_turn(db):
+    """Test that a turn stores its message, usage and thinking time together"""
+    db.record_turn("assistant", "Reasoning", "conv1", 0.002, 1.5, is_reasoning=True)
+    assert db.get_chat_history("conv1") == [
+        {"role": "assistant", "content": "Reasoning", "is_reasoning": True},
+    ]
+    assert db.get_total_credits_used("conv1") == pytest.approx(0.002)
+    assert db.get_total_thinking_time("conv1") == pytest.approx(1.5)
+
+def test_chat_history_tail(db):
+    """Test that the tail returns the latest messages in order"""
+    db.add_chat_messages([("user", f"Message {i}", "conv1", False) for i in range(10)])
+    db.add_chat_message("assistant", "Last", "conv1")
+    tail = db.get_chat_history_tail("conv1", 3)
+    assert [message["content"] for message in tail] == ["Message 8", "Message 9", "Last"]
+    assert db.get_chat_history_tail("conv1", 500) == db.get_chat_history("conv1")
+
+def test_batch_holds_writes_until_commit(db):
+    """Test that writes made inside a batch are committed together"""
+    db.begin_batch()
+    db.add_chat_message("user", "Held", "conv1")
+    db.add_api_usage(0.5, "chat_completion", "conv1")
+    assert db.get_chat_history("conv1") == []
+    db.commit_batch()
+    assert len(db.get_chat_history("conv1")) == 1
+    assert db.get_total_credits_used("conv1") == pytest.approx(0.5)
+
+def test_cached_reads_do_not_wait_for_writer(tmp_path):
+    """Test that cached reads and external-write detection skip the write lock"""
+    path = str(tmp_path / "history.db")
+    manager = DatabaseManager(path)
+    other = DatabaseManager(path)
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        manager.add_api_usage(0.5, "chat_completion", "conv1")
+        assert manager.get_total_credits_used("conv1") == pytest.approx(0.5)
+        other.add_api_usage(0.25, "chat_completion", "conv1")
+        other.flush()
+        with manager._write_lock:
+            # Simulates the writer thread holding a long transaction
+            total = pool.submit(manager.get_total_credits_used, "conv1").result(timeout=5)
+        assert total == pytest.approx(0.75)
+    finally:
+        pool.shutdown()
+        other.close()
+        manager.close()
@@ -3,16 +3,18 @@
 import pytest
 import os
 import json
+import asyncio
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
-from gui import DeepSeekEngineerGUI, MessageBubble, FileToCreate, FileToEdit, AssistantResponse
+from gui import DeepSeekEngineerGUI, MessageBubble, FileToCreate, FileToEdit, AssistantResponse, JsonStreamScanner
 
 @pytest.fixture
 def app():
     """
     Fixture to create a test instance of the DeepSeekEngineerGUI
     """
-    with patch('gui.OpenAI'), \
+    with patch('openai.AsyncOpenAI'), \
          patch('gui.load_dotenv'), \
          patch('gui.DatabaseManager'), \
          patch('customtkinter.CTk'), \
@@ -59,6 +61,12 @@ def test_handle_assistant_response(app):
         app.handle_assistant_response(json.dumps(response))
         mock_append.assert_called_with("Test reply", is_user=False)
 
+def test_handle_plain_text_response(app):
+    """Test that a non-JSON reply is shown as-is instead of as a parse error"""
+    with patch.object(app, 'append_to_conversation') as mock_append:
+        app.handle_assistant_response("Just a plain answer.")
+        mock_append.assert_called_once_with("Just a plain answer.", is_user=False)
+
 def test_file_models():
     """Test the file operation models"""
     file_create = FileToCreate(path="test.py", content="print('test')")
@@ -73,3 +81,98 @@ def test_file_models():
     assert file_edit.path == "test.py"
     assert file_edit.original_snippet == "old code"
     assert file_edit.new_snippet == "new code"
+
+def test_json_stream_scanner_values():
+    """Test that streamed reply members are reported as soon as they close"""
+    response = {
+        "assistant_reply": "Edit {this}, \"quoted\"",
+        "files_to_create": [{"path": "a.py", "content": "x = [1]\n"}],
+        "files_to_edit": [{"path": "b.py", "original_snippet": "}", "new_snippet": "]"}]
+    }
+    text = json.dumps(response)
+    scanner = JsonStreamScanner()
+    done = False
+    for i in range(0, len(text), 3):
+        done = scanner.feed(text[i:i + 3])
+    assert done
+    assert scanner.values == [
+        ("assistant_reply", response["assistant_reply"]),
+        ("files_to_create", response["files_to_create"][0]),
+        ("files_to_edit", response["files_to_edit"][0]),
+    ]
+    # Without member capture only the end of the value is reported
+    scanner = JsonStreamScanner(capture_members=False)
+    assert any(scanner.feed(text[i:i + 3]) for i in range(0, len(text), 3))
+    assert scanner.values == []
+
+class StreamHarness:
+    """
+    Just enough of the GUI to run _process_completion without a display;
+    after() runs each callback straight away, in the order Tk would
+    """
+    _process_completion = DeepSeekEngineerGUI._process_completion
+    _run_on_ui = DeepSeekEngineerGUI._run_on_ui
+    _handle_response_value = DeepSeekEngineerGUI._handle_response_value
+
+    def __init__(self, db, chunks):
+        self.db = db
+        self.conversation_id = "test"
+        self.conversation_history = []
+        for name in ("current_thinking_label", "input_field", "send_button", "start_thinking_animation",
+                     "stop_thinking_animation", "_enqueue_token", "_refresh_api_balance_async",
+                     "handle_assistant_response", "_create_response_file", "_edit_response_file"):
+            setattr(self, name, MagicMock())
+
+        async def create(**kwargs):
+            async def stream():
+                for reasoning, content in chunks:
+                    if isinstance(reasoning, Exception):
+                        raise reasoning
+                    delta = SimpleNamespace(reasoning_content=reasoning, content=content)
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+            return stream()
+        self.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    def after(self, ms, fn, *args):
+        fn(*args)
+
+    def append_to_conversation(self, text, is_user=False, is_reasoning=False, persist=True):
+        if persist:
+            self.db.add_chat_message("user" if is_user else "assistant", text, self.conversation_id, is_reasoning)
+        return MagicMock()
+
+def split_json(response, size=5):
+    text = json.dumps(response)
+    return [(None, text[i:i + size]) for i in range(0, len(text), size)]
+
+def test_streamed_reasoning_stored_before_reply(db):
+    """Test that the reasoning is stored ahead of the reply it led to"""
+    chunks = [("Let me ", None), ("think.", None)] + split_json({"assistant_reply": "Done."})
+    harness = StreamHarness(db, chunks)
+    asyncio.run(harness._process_completion("deepseek-reasoner"))
+    assert db.get_chat_history("test") == [
+        {"role": "assistant", "content": "Let me think.", "is_reasoning": True},
+        {"role": "assistant", "content": "Done.", "is_reasoning": False},
+    ]
+
+def test_streamed_files_handled_once(db):
+    """Test that streamed file members are acted on once, not again when the JSON closes"""
+    item = {"path": "a.py", "content": "print('a')\n"}
+    harness = StreamHarness(db, split_json({"assistant_reply": "Created.", "files_to_create": [item]}))
+    asyncio.run(harness._process_completion("deepseek-chat"))
+    harness._create_response_file.assert_called_once_with(item)
+    harness.handle_assistant_response.assert_not_called()
+
+def test_failed_stream_usage_recorded(db):
+    """Test that a request failing mid-stream still records its usage and reasoning"""
+    harness = StreamHarness(db, [("Hmm", None), (ConnectionError("dropped"), None)])
+    asyncio.run(harness._process_completion("deepseek-reasoner"))
+    assert db.get_total_credits_used("test") == pytest.approx(0.002)
+    assert db.get_chat_history("test")[0] == {"role": "assistant", "content": "Hmm", "is_reasoning": True}
+
+def test_thinking_time_without_reasoning(db):
+    """Test that replies without reasoning record no thinking time"""
+    harness = StreamHarness(db, [(None, "Plain "), (None, "answer.")])
+    asyncio.run(harness._process_completion("deepseek-chat"))
+    assert db.get_total_credits_used("test") == pytest.approx(0.002)
+    assert db.get_total_thinking_time("test") == 0